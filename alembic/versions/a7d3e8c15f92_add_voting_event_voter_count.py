@@ -0,0 +1,125 @@
+"""add voter_count to voting_events
+
+Revision ID: a7d3e8c15f92
+Revises: f6b37d92a4e1
+Create Date: 2026-10-17 13:02:18.614207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e8c15f92'
+down_revision: Union[str, Sequence[str], None] = 'f6b37d92a4e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Adds to the count the voters in {rows} with no other vote in their event,
+# i.e. whose first vote this statement inserted
+COUNT_NEW_VOTERS = """
+    UPDATE voting_events ve
+    SET voter_count = ve.voter_count + d.voters
+    FROM (
+        SELECT n.voting_event_id, COUNT(DISTINCT n.voter_id) AS voters
+        FROM {rows} n
+        WHERE NOT EXISTS (
+            SELECT 1 FROM individual_votes iv
+            WHERE iv.voting_event_id = n.voting_event_id
+              AND iv.voter_id = n.voter_id
+              AND NOT EXISTS (SELECT 1 FROM {rows} r WHERE r.id = iv.id)
+        ){extra}
+        GROUP BY n.voting_event_id
+    ) d
+    WHERE ve.id = d.voting_event_id;
+"""
+
+# Subtracts the voters in old_rows with no votes left in their event
+COUNT_GONE_VOTERS = """
+    UPDATE voting_events ve
+    SET voter_count = ve.voter_count - d.voters
+    FROM (
+        SELECT o.voting_event_id, COUNT(DISTINCT o.voter_id) AS voters
+        FROM old_rows o
+        WHERE NOT EXISTS (
+            SELECT 1 FROM individual_votes iv
+            WHERE iv.voting_event_id = o.voting_event_id AND iv.voter_id = o.voter_id
+        )
+        GROUP BY o.voting_event_id
+    ) d
+    WHERE ve.id = d.voting_event_id;
+"""
+
+# Names sort after individual_votes_bump_version_*, which has already locked
+# the event rows, so each statement here sees every earlier committed vote.
+# Changing a vote_choice never changes who voted, so updates return early
+# unless a row moved to another voter or event. (UPDATE OF <columns> can't be
+# combined with transition tables.)
+SKIP_UNMOVED_ROWS = """
+    IF NOT EXISTS (
+        SELECT 1 FROM old_rows o JOIN new_rows n ON n.id = o.id
+        WHERE (o.voting_event_id, o.voter_id) IS DISTINCT FROM (n.voting_event_id, n.voter_id)
+    ) THEN
+        RETURN NULL;
+    END IF;
+"""
+
+TRIGGERS = {
+    'insert': ('INSERT', 'NEW TABLE AS new_rows', COUNT_NEW_VOTERS.format(rows='new_rows', extra='')),
+    'update': (
+        'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        SKIP_UNMOVED_ROWS + COUNT_GONE_VOTERS + COUNT_NEW_VOTERS.format(
+            rows='new_rows',
+            extra="""
+          AND NOT EXISTS (
+            SELECT 1 FROM old_rows o
+            WHERE o.voting_event_id = n.voting_event_id AND o.voter_id = n.voter_id
+        )"""
+        )
+    ),
+    'delete': ('DELETE', 'OLD TABLE AS old_rows', COUNT_GONE_VOTERS),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('voting_events', sa.Column('voter_count', sa.Integer(), server_default='0', nullable=False))
+
+    for name, (event, referencing, body) in TRIGGERS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION individual_votes_voter_count_{name}() RETURNS trigger AS $$
+            BEGIN
+                {body}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        op.execute(f"""
+            CREATE TRIGGER individual_votes_voter_count_{name}
+            AFTER {event} ON individual_votes
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION individual_votes_voter_count_{name}();
+        """)
+
+    # Backfill from existing votes
+    op.execute("""
+        UPDATE voting_events ve
+        SET voter_count = c.voters
+        FROM (
+            SELECT voting_event_id, COUNT(DISTINCT voter_id) AS voters
+            FROM individual_votes
+            GROUP BY voting_event_id
+        ) c
+        WHERE ve.id = c.voting_event_id;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS individual_votes_voter_count_{name} ON individual_votes;")
+        op.execute(f"DROP FUNCTION IF EXISTS individual_votes_voter_count_{name}();")
+    op.drop_column('voting_events', 'voter_count')
@@ -0,0 +1,63 @@
+"""add effective_end_time to voting_events
+
+Revision ID: b1c7e4f28d63
+Revises: a7d3e8c15f92
+Create Date: 2026-10-17 15:41:07.208356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1c7e4f28d63'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e8c15f92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# timestamptz + interval isn't immutable, so this can't be a generated column;
+# a BEFORE trigger keeps it in step with whichever end time mode is active
+EFFECTIVE_END_TIME = """
+    CASE WHEN active_time_tab = 'duration'
+         THEN created_at + duration_hours * interval '1 hour'
+         ELSE end_time
+    END
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('voting_events', sa.Column('effective_end_time', sa.DateTime(timezone=True), nullable=True))
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION voting_events_set_effective_end_time() RETURNS trigger AS $$
+        BEGIN
+            NEW.effective_end_time := CASE WHEN NEW.active_time_tab = 'duration'
+                THEN NEW.created_at + NEW.duration_hours * interval '1 hour'
+                ELSE NEW.end_time
+            END;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER voting_events_set_effective_end_time
+        BEFORE INSERT OR UPDATE OF active_time_tab, created_at, duration_hours, end_time ON voting_events
+        FOR EACH ROW EXECUTE FUNCTION voting_events_set_effective_end_time();
+    """)
+
+    # Backfill existing events
+    op.execute(f"UPDATE voting_events SET effective_end_time = {EFFECTIVE_END_TIME};")
+
+    op.create_index('ix_voting_events_effective_end_time', 'voting_events', ['effective_end_time'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_voting_events_effective_end_time', table_name='voting_events')
+    op.execute("DROP TRIGGER IF EXISTS voting_events_set_effective_end_time ON voting_events;")
+    op.execute("DROP FUNCTION IF EXISTS voting_events_set_effective_end_time();")
+    op.drop_column('voting_events', 'effective_end_time')
@@ -0,0 +1,75 @@
+"""send tally NOTIFYs from the version bump triggers
+
+Revision ID: b4e7c1d95a20
+Revises: f2c8a6d39e14
+Create Date: 2026-10-17 22:41:08.205517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7c1d95a20'
+down_revision: Union[str, Sequence[str], None] = 'f2c8a6d39e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same statements as individual_votes_bump_version_*, which now also NOTIFY
+# 'vote_tallies' with {"e": event_id, "v": new tally_version} for every event
+# they bump. The write stays a single statement and, like any NOTIFY, the
+# message is only delivered if the transaction commits.
+# NOTIFY takes a cluster-wide lock on the notification queue at commit, so it
+# is only sent from sessions that set app.tally_notify = 'on' (database.py does
+# when TALLY_NOTIFY_ENABLED is true); everyone else just bumps the version.
+TRIGGERS = {
+    'insert': "SELECT voting_event_id FROM new_rows",
+    'update': "SELECT voting_event_id FROM new_rows UNION SELECT voting_event_id FROM old_rows",
+    'delete': "SELECT voting_event_id FROM old_rows",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, changed_events in TRIGGERS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION individual_votes_bump_version_{name}() RETURNS trigger AS $$
+            DECLARE
+                bumped record;
+            BEGIN
+                IF current_setting('app.tally_notify', true) IS DISTINCT FROM 'on' THEN
+                    UPDATE voting_events
+                    SET tally_version = tally_version + 1
+                    WHERE id IN ({changed_events});
+                    RETURN NULL;
+                END IF;
+                FOR bumped IN
+                    UPDATE voting_events
+                    SET tally_version = tally_version + 1
+                    WHERE id IN ({changed_events})
+                    RETURNING id, tally_version
+                LOOP
+                    PERFORM pg_notify('vote_tallies', json_build_object('e', bumped.id, 'v', bumped.tally_version)::text);
+                END LOOP;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, changed_events in TRIGGERS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION individual_votes_bump_version_{name}() RETURNS trigger AS $$
+            BEGIN
+                UPDATE voting_events
+                SET tally_version = tally_version + 1
+                WHERE id IN ({changed_events});
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
@@ -0,0 +1,44 @@
+"""add unique constraint on individual_votes (event, voter, emote)
+
+Revision ID: c3e9a1f47d20
+Revises: b8f2c3d4e5a6
+Create Date: 2026-10-17 09:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e9a1f47d20'
+down_revision: Union[str, Sequence[str], None] = 'b8f2c3d4e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Double clicks could race past the old SELECT-then-INSERT path and leave
+    # duplicate rows behind. Keep the most recent vote for each
+    # (event, voter, emote) before adding the constraint.
+    op.execute("""
+        DELETE FROM individual_votes a
+        USING individual_votes b
+        WHERE a.voting_event_id = b.voting_event_id
+        AND a.voter_id = b.voter_id
+        AND a.emote_id = b.emote_id
+        AND a.id < b.id;
+    """)
+
+    op.create_unique_constraint(
+        'uq_individual_votes_event_voter_emote',
+        'individual_votes',
+        ['voting_event_id', 'voter_id', 'emote_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_individual_votes_event_voter_emote', 'individual_votes', type_='unique')
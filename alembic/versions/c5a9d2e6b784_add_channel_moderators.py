@@ -0,0 +1,99 @@
+"""replace users.moderators / can_create_votes_for with channel_moderators
+
+Revision ID: c5a9d2e6b784
+Revises: b1c7e4f28d63
+Create Date: 2026-10-17 16:58:33.970415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9d2e6b784'
+down_revision: Union[str, Sequence[str], None] = 'b1c7e4f28d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'channel_moderators',
+        sa.Column('channel_user_id', sa.Integer(), nullable=False),
+        sa.Column('moderator_user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['channel_user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['moderator_user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('channel_user_id', 'moderator_user_id')
+    )
+    op.create_index(
+        'ix_channel_moderators_moderator_channel', 'channel_moderators',
+        ['moderator_user_id', 'channel_user_id']
+    )
+
+    # The two arrays were kept in sync by hand, so take the union of both sides
+    op.execute("""
+        INSERT INTO channel_moderators (channel_user_id, moderator_user_id)
+        SELECT channel.id, moderator.id
+        FROM users channel
+        CROSS JOIN LATERAL unnest(channel.moderators) AS m(username)
+        JOIN users moderator ON moderator.twitch_username = m.username
+        UNION
+        SELECT channel.id, moderator.id
+        FROM users moderator
+        CROSS JOIN LATERAL unnest(moderator.can_create_votes_for) AS c(username)
+        JOIN users channel ON channel.twitch_username = c.username
+        ON CONFLICT DO NOTHING;
+    """)
+
+    # Mods listed without an account yet should already have a pending row;
+    # add any that are missing so they still get access on first login
+    op.execute("""
+        INSERT INTO pending_permissions (twitch_username, granted_by_user_id, permission_type)
+        SELECT DISTINCT m.username, channel.id, 'moderator'
+        FROM users channel
+        CROSS JOIN LATERAL unnest(channel.moderators) AS m(username)
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.twitch_username = m.username)
+          AND NOT EXISTS (
+              SELECT 1 FROM pending_permissions p
+              WHERE p.twitch_username = m.username AND p.granted_by_user_id = channel.id
+          );
+    """)
+
+    op.drop_column('users', 'moderators')
+    op.drop_column('users', 'can_create_votes_for')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('users', sa.Column('can_create_votes_for', postgresql.ARRAY(sa.String()), nullable=True))
+    op.add_column('users', sa.Column('moderators', postgresql.ARRAY(sa.String()), nullable=True))
+
+    op.execute("""
+        UPDATE users u
+        SET moderators = COALESCE((
+            SELECT array_agg(name ORDER BY created_at) FROM (
+                SELECT moderator.twitch_username AS name, cm.created_at
+                FROM channel_moderators cm
+                JOIN users moderator ON moderator.id = cm.moderator_user_id
+                WHERE cm.channel_user_id = u.id
+                UNION ALL
+                SELECT p.twitch_username, p.created_at
+                FROM pending_permissions p
+                WHERE p.granted_by_user_id = u.id AND p.permission_type = 'moderator'
+            ) mods
+        ), '{}'),
+        can_create_votes_for = COALESCE((
+            SELECT array_agg(channel.twitch_username ORDER BY cm.created_at)
+            FROM channel_moderators cm
+            JOIN users channel ON channel.id = cm.channel_user_id
+            WHERE cm.moderator_user_id = u.id
+        ), '{}');
+    """)
+
+    op.drop_index('ix_channel_moderators_moderator_channel', table_name='channel_moderators')
+    op.drop_table('channel_moderators')
@@ -0,0 +1,106 @@
+"""add event_emote_tallies maintained from individual_votes
+
+Revision ID: d41f7b2e9c05
+Revises: c3e9a1f47d20
+Create Date: 2026-10-17 10:03:27.614902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f7b2e9c05'
+down_revision: Union[str, Sequence[str], None] = 'c3e9a1f47d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Every trigger turns its transition table(s) into signed per-choice deltas and
+# folds them into the tally rows with one upsert. Rows are grouped and ordered
+# by (event, emote) so concurrent statements lock tally rows in the same order.
+APPLY_DELTAS = """
+    INSERT INTO event_emote_tallies AS t (voting_event_id, emote_id, keep_count, neutral_count, remove_count)
+    SELECT voting_event_id, emote_id,
+        COALESCE(SUM(delta) FILTER (WHERE vote_choice = 'keep'), 0),
+        COALESCE(SUM(delta) FILTER (WHERE vote_choice = 'neutral'), 0),
+        COALESCE(SUM(delta) FILTER (WHERE vote_choice = 'remove'), 0)
+    FROM ({changes}) AS changes
+    WHERE voting_event_id IS NOT NULL AND emote_id IS NOT NULL
+    GROUP BY voting_event_id, emote_id
+    HAVING COALESCE(SUM(delta) FILTER (WHERE vote_choice = 'keep'), 0) <> 0
+        OR COALESCE(SUM(delta) FILTER (WHERE vote_choice = 'neutral'), 0) <> 0
+        OR COALESCE(SUM(delta) FILTER (WHERE vote_choice = 'remove'), 0) <> 0
+    ORDER BY voting_event_id, emote_id
+    ON CONFLICT (voting_event_id, emote_id) DO UPDATE SET
+        keep_count = t.keep_count + EXCLUDED.keep_count,
+        neutral_count = t.neutral_count + EXCLUDED.neutral_count,
+        remove_count = t.remove_count + EXCLUDED.remove_count;
+"""
+
+TRIGGERS = {
+    'insert': (
+        'INSERT', 'NEW TABLE AS new_rows',
+        "SELECT voting_event_id, emote_id, vote_choice, 1 AS delta FROM new_rows"
+    ),
+    'update': (
+        'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        "SELECT voting_event_id, emote_id, vote_choice, 1 AS delta FROM new_rows "
+        "UNION ALL SELECT voting_event_id, emote_id, vote_choice, -1 AS delta FROM old_rows"
+    ),
+    'delete': (
+        'DELETE', 'OLD TABLE AS old_rows',
+        "SELECT voting_event_id, emote_id, vote_choice, -1 AS delta FROM old_rows"
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('event_emote_tallies',
+    sa.Column('voting_event_id', sa.Integer(), nullable=False),
+    sa.Column('emote_id', sa.String(), nullable=False),
+    sa.Column('keep_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('neutral_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('remove_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['voting_event_id'], ['voting_events.id'], ),
+    sa.PrimaryKeyConstraint('voting_event_id', 'emote_id')
+    )
+
+    for name, (event, referencing, changes) in TRIGGERS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION individual_votes_tally_{name}() RETURNS trigger AS $$
+            BEGIN
+                {APPLY_DELTAS.format(changes=changes)}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        op.execute(f"""
+            CREATE TRIGGER individual_votes_tally_{name}
+            AFTER {event} ON individual_votes
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION individual_votes_tally_{name}();
+        """)
+
+    # Backfill tallies for existing events
+    op.execute("""
+        INSERT INTO event_emote_tallies (voting_event_id, emote_id, keep_count, neutral_count, remove_count)
+        SELECT voting_event_id, emote_id,
+            COUNT(*) FILTER (WHERE vote_choice = 'keep'),
+            COUNT(*) FILTER (WHERE vote_choice = 'neutral'),
+            COUNT(*) FILTER (WHERE vote_choice = 'remove')
+        FROM individual_votes
+        WHERE voting_event_id IS NOT NULL AND emote_id IS NOT NULL
+        GROUP BY voting_event_id, emote_id;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS individual_votes_tally_{name} ON individual_votes;")
+        op.execute(f"DROP FUNCTION IF EXISTS individual_votes_tally_{name}();")
+    op.drop_table('event_emote_tallies')
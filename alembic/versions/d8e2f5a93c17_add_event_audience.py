@@ -0,0 +1,60 @@
+"""replace voting_events.specific_users with event_audience
+
+Revision ID: d8e2f5a93c17
+Revises: c5a9d2e6b784
+Create Date: 2026-10-17 18:20:45.116032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e2f5a93c17'
+down_revision: Union[str, Sequence[str], None] = 'c5a9d2e6b784'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'event_audience',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('twitch_username', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['event_id'], ['voting_events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id', 'twitch_username')
+    )
+    op.create_index('ix_event_audience_username_event', 'event_audience', ['twitch_username', 'event_id'])
+
+    op.execute("""
+        INSERT INTO event_audience (event_id, twitch_username)
+        SELECT DISTINCT ve.id, u.username
+        FROM voting_events ve
+        CROSS JOIN LATERAL unnest(ve.specific_users) AS u(username)
+        WHERE u.username IS NOT NULL;
+    """)
+
+    op.drop_column('voting_events', 'specific_users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('voting_events', sa.Column('specific_users', postgresql.ARRAY(sa.String()), nullable=True))
+
+    op.execute("""
+        UPDATE voting_events ve
+        SET specific_users = a.usernames
+        FROM (
+            SELECT event_id, array_agg(twitch_username ORDER BY twitch_username) AS usernames
+            FROM event_audience
+            GROUP BY event_id
+        ) a
+        WHERE ve.id = a.event_id;
+    """)
+
+    op.drop_index('ix_event_audience_username_event', table_name='event_audience')
+    op.drop_table('event_audience')
@@ -0,0 +1,63 @@
+"""add tally_version to voting_events
+
+Revision ID: e5a28c61b3f7
+Revises: d41f7b2e9c05
+Create Date: 2026-10-17 11:26:52.470133
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a28c61b3f7'
+down_revision: Union[str, Sequence[str], None] = 'd41f7b2e9c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Statement-level triggers bump the event's version once per vote write.
+# Trigger names sort before individual_votes_tally_*, so the voting_events row
+# is locked (and concurrent writers to the same event serialized) before the
+# tally rows are touched. Versions therefore follow commit order.
+TRIGGERS = {
+    'insert': ('INSERT', 'NEW TABLE AS new_rows', "SELECT voting_event_id FROM new_rows"),
+    'update': (
+        'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        "SELECT voting_event_id FROM new_rows UNION SELECT voting_event_id FROM old_rows"
+    ),
+    'delete': ('DELETE', 'OLD TABLE AS old_rows', "SELECT voting_event_id FROM old_rows"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('voting_events', sa.Column('tally_version', sa.BigInteger(), server_default='0', nullable=False))
+
+    for name, (event, referencing, changed_events) in TRIGGERS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION individual_votes_bump_version_{name}() RETURNS trigger AS $$
+            BEGIN
+                UPDATE voting_events
+                SET tally_version = tally_version + 1
+                WHERE id IN ({changed_events});
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        op.execute(f"""
+            CREATE TRIGGER individual_votes_bump_version_{name}
+            AFTER {event} ON individual_votes
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION individual_votes_bump_version_{name}();
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS individual_votes_bump_version_{name} ON individual_votes;")
+        op.execute(f"DROP FUNCTION IF EXISTS individual_votes_bump_version_{name}();")
+    op.drop_column('voting_events', 'tally_version')
@@ -0,0 +1,44 @@
+"""add emote_set_snapshots and seventv_user_emote_sets
+
+Revision ID: e9b4c2d71a38
+Revises: d8e2f5a93c17
+Create Date: 2026-10-17 21:12:36.540817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b4c2d71a38'
+down_revision: Union[str, Sequence[str], None] = 'd8e2f5a93c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'emote_set_snapshots',
+        sa.Column('emote_set_id', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('emotes', postgresql.JSONB(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('emote_set_id')
+    )
+    op.create_table(
+        'seventv_user_emote_sets',
+        sa.Column('seventv_user_id', sa.String(), nullable=False),
+        sa.Column('emote_sets', postgresql.JSONB(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('seventv_user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('seventv_user_emote_sets')
+    op.drop_table('emote_set_snapshots')
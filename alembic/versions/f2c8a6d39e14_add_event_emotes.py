@@ -0,0 +1,39 @@
+"""add event_emotes
+
+Revision ID: f2c8a6d39e14
+Revises: e9b4c2d71a38
+Create Date: 2026-10-17 22:04:51.873260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a6d39e14'
+down_revision: Union[str, Sequence[str], None] = 'e9b4c2d71a38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing events are snapshotted from 7TV the first time their emotes
+    # are requested (GET /votes/{id}/emotes), so there is no backfill here
+    op.create_table(
+        'event_emotes',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('ordinal', sa.Integer(), nullable=False),
+        sa.Column('emote_id', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['event_id'], ['voting_events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id', 'ordinal'),
+        sa.UniqueConstraint('event_id', 'emote_id', name='uq_event_emotes_event_emote')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('event_emotes')
@@ -0,0 +1,58 @@
+"""add version to event_emote_tallies
+
+Revision ID: f6b37d92a4e1
+Revises: e5a28c61b3f7
+Create Date: 2026-10-17 12:08:14.902356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b37d92a4e1'
+down_revision: Union[str, Sequence[str], None] = 'e5a28c61b3f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('event_emote_tallies', sa.Column('version', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Existing rows count as changed at the event's current version
+    op.execute("""
+        UPDATE event_emote_tallies t
+        SET version = v.tally_version
+        FROM voting_events v
+        WHERE v.id = t.voting_event_id;
+    """)
+
+    op.create_index('ix_event_emote_tallies_event_version', 'event_emote_tallies', ['voting_event_id', 'version'])
+
+    # Stamp each tally row with the event version of the write that changed it.
+    # The version bump trigger on individual_votes runs before the tally
+    # trigger, so this reads the already-bumped value.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION event_emote_tallies_stamp_version() RETURNS trigger AS $$
+        BEGIN
+            SELECT tally_version INTO NEW.version FROM voting_events WHERE id = NEW.voting_event_id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER event_emote_tallies_stamp_version
+        BEFORE INSERT OR UPDATE ON event_emote_tallies
+        FOR EACH ROW EXECUTE FUNCTION event_emote_tallies_stamp_version();
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS event_emote_tallies_stamp_version ON event_emote_tallies;")
+    op.execute("DROP FUNCTION IF EXISTS event_emote_tallies_stamp_version();")
+    op.drop_index('ix_event_emote_tallies_event_version', table_name='event_emote_tallies')
+    op.drop_column('event_emote_tallies', 'version')
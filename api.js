@@ -115,7 +115,8 @@ export async function createNeutralVotesInBackground(votingEventId, emotes, user
             
             // Update UI immediately
             try {
-                const updatedVoteData = await getVoteCounts(votingEventId);
+                // Shared, briefly cached counts rather than a per-user /counts read
+                const updatedVoteData = await getVoteTallies(votingEventId);
                 // Update all neutral buttons to show as active
                 document.querySelectorAll('.vote-neutral').forEach(button => {
                     button.classList.remove('inactive');
@@ -137,16 +138,45 @@ export async function createNeutralVotesInBackground(votingEventId, emotes, user
 
 
 
-export async function getVoteCounts(eventId) {
+// The event's emote list as snapshotted when it was created; fixed for the
+// event's lifetime, so it doesn't go through 7TV
+export async function getEventEmotes(eventId) {
     try {
-        const response = await fetch(`${API_BASE}/votes/${eventId}/counts`, { credentials: 'include' });
+        const response = await fetch(`${API_BASE}/votes/${eventId}/emotes`, { credentials: 'include' });
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const data = await response.json();
-        return data;
+        return await response.json();
+    } catch (error) {
+        console.error('Error in getEventEmotes:', error);
+        throw error;
+    }
+}
+
+// Aggregate counts shared by every viewer (briefly cacheable), fetched separately
+// from the caller's own choices
+export async function getVoteTallies(eventId) {
+    try {
+        const response = await fetch(`${API_BASE}/votes/${eventId}/tallies`, { credentials: 'include' });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return await response.json();
+    } catch (error) {
+        console.error('Error in getVoteTallies:', error);
+        throw error;
+    }
+}
+
+export async function getMyVoteChoices(eventId) {
+    try {
+        const response = await fetch(`${API_BASE}/votes/${eventId}/my-choices`, { credentials: 'include' });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return await response.json();
     } catch (error) {
-        console.error('Error in getVoteCounts:', error);
+        console.error('Error in getMyVoteChoices:', error);
         throw error;
     }
 }
\ No newline at end of file
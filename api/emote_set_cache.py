@@ -0,0 +1,361 @@
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import EmoteSetSnapshot, SevenTVUserEmoteSets
+from api.seventv_api import post_seventv_gql
+from api.single_flight import SingleFlight
+
+# Emote sets change rarely, so 7TV is asked at most once per
+# EMOTE_SET_CACHE_TTL_SECONDS per set. Lookups go through an in-process LRU,
+# then the snapshot tables (shared by all workers and restarts), then 7TV.
+# A snapshot older than the TTL is still served while one background refresh
+# replaces it, and if 7TV is down any snapshot is better than an error.
+EMOTE_SET_CACHE_TTL_SECONDS = float(os.getenv('EMOTE_SET_CACHE_TTL_SECONDS', '600'))
+EMOTE_SET_CACHE_STALE_SECONDS = float(os.getenv('EMOTE_SET_CACHE_STALE_SECONDS', '86400'))
+EMOTE_SET_CACHE_MAX_ENTRIES = int(os.getenv('EMOTE_SET_CACHE_MAX_ENTRIES', '500'))
+# Keys per GraphQL document when several are fetched at once (get_many)
+EMOTE_SET_CACHE_BATCH_SIZE = int(os.getenv('EMOTE_SET_CACHE_BATCH_SIZE', '50'))
+
+V = TypeVar('V')
+Snapshot = Tuple[datetime, Any]  # (fetched_at, value)
+# fetched_at of an invalidated snapshot
+EXPIRED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class TwoTierCache(Generic[V]):
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[str], Awaitable[Optional[V]]],
+        read_snapshot: Callable[[AsyncSession, str], Awaitable[Optional[Snapshot]]],
+        write_snapshot: Callable[[AsyncSession, str, V], Awaitable[None]],
+        expire_snapshot: Callable[[AsyncSession, str], Awaitable[None]],
+        # Needed for get_many
+        fetch_many: Optional[Callable[[List[str]], Awaitable[Dict[str, Optional[V]]]]] = None,
+        read_snapshots: Optional[Callable[[AsyncSession, List[str]], Awaitable[Dict[str, Snapshot]]]] = None,
+    ):
+        self._name = name
+        self._fetch = fetch
+        self._read_snapshot = read_snapshot
+        self._write_snapshot = write_snapshot
+        self._expire_snapshot = expire_snapshot
+        self._fetch_many = fetch_many
+        self._read_snapshots = read_snapshots
+        self._entries: OrderedDict[str, Snapshot] = OrderedDict()
+        # One load per key, whether on its own or as its share of a batch
+        self._loads = SingleFlight(on_error=self._log_failure)
+
+    async def get(self, key: str, fresh: bool = False) -> Optional[V]:
+        """The value for key, or None if 7TV doesn't know it. Raises if 7TV fails and nothing is stored.
+
+        With fresh=True only a value younger than the TTL is returned; anything
+        older waits for 7TV, and a failed fetch raises instead of falling back.
+        """
+        snapshot = self._entries.get(key)
+        if snapshot is not None:
+            self._entries.move_to_end(key)
+        else:
+            async with AsyncSessionLocal() as db:
+                snapshot = await self._read_snapshot(db, key)
+            if snapshot is not None:
+                self._remember(key, snapshot)
+            else:
+                # A load may have finished while we were reading
+                snapshot = self._entries.get(key)
+
+        if snapshot is not None:
+            age = (datetime.now(timezone.utc) - snapshot[0]).total_seconds()
+            if age < EMOTE_SET_CACHE_TTL_SECONDS:
+                return snapshot[1]
+            if age < EMOTE_SET_CACHE_TTL_SECONDS + EMOTE_SET_CACHE_STALE_SECONDS and not fresh:
+                self._refresh(key)
+                return snapshot[1]
+
+        try:
+            return await asyncio.shield(self._refresh(key))
+        except Exception as e:
+            if snapshot is None or fresh:
+                raise
+            print(f"[EMOTE CACHE] 7TV refresh of {self._name} {key} failed, serving snapshot: {str(e)}")
+            return snapshot[1]
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[V]]:
+        """get() for several keys with one snapshot query and batched 7TV fetches.
+
+        Keys that failed to load and have no snapshot are left out.
+        """
+        keys = list(dict.fromkeys(keys))
+        snapshots: Dict[str, Snapshot] = {}
+        for key in keys:
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+                snapshots[key] = snapshot
+        unknown = [key for key in keys if key not in snapshots]
+        if unknown:
+            async with AsyncSessionLocal() as db:
+                stored = await self._read_snapshots(db, unknown)
+            for key, snapshot in stored.items():
+                self._remember(key, snapshot)
+                snapshots[key] = snapshot
+
+        values: Dict[str, Optional[V]] = {}
+        stale, missing = [], []
+        now = datetime.now(timezone.utc)
+        for key in keys:
+            snapshot = snapshots.get(key)
+            age = (now - snapshot[0]).total_seconds() if snapshot is not None else None
+            if age is not None and age < EMOTE_SET_CACHE_TTL_SECONDS + EMOTE_SET_CACHE_STALE_SECONDS:
+                values[key] = snapshot[1]
+                if age >= EMOTE_SET_CACHE_TTL_SECONDS:
+                    stale.append(key)
+            else:
+                missing.append(key)
+        if stale:
+            self._refresh_many(stale)
+
+        for key, load in self._refresh_many(missing).items():
+            try:
+                values[key] = await asyncio.shield(load)
+            except Exception:
+                # Already logged by the load
+                if key in snapshots:
+                    values[key] = snapshots[key][1]
+        return values
+
+    async def invalidate(self, key: str):
+        """Make the next get() fetch from 7TV. The snapshot is kept as a fallback if that fails."""
+        self._entries.pop(key, None)
+        async with AsyncSessionLocal() as db:
+            await self._expire_snapshot(db, key)
+            await db.commit()
+
+    def _remember(self, key: str, snapshot: Snapshot):
+        self._entries[key] = snapshot
+        self._entries.move_to_end(key)
+        while len(self._entries) > EMOTE_SET_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def _refresh(self, key: str) -> asyncio.Task:
+        return self._loads.start(key, lambda: self._load(key))
+
+    async def _load(self, key: str) -> Optional[V]:
+        value = await self._fetch(key)
+        if value is not None:
+            async with AsyncSessionLocal() as db:
+                await self._write_snapshot(db, key, value)
+                await db.commit()
+            self._remember(key, (datetime.now(timezone.utc), value))
+        return value
+
+    def _refresh_many(self, keys: List[str]) -> Dict[str, asyncio.Task]:
+        loads = {key: self._refresh(key) for key in keys if key in self._loads}
+        new_keys = [key for key in keys if key not in loads]
+        for start in range(0, len(new_keys), EMOTE_SET_CACHE_BATCH_SIZE):
+            chunk = new_keys[start:start + EMOTE_SET_CACHE_BATCH_SIZE]
+            batch = asyncio.create_task(self._load_many(chunk))
+            for key in chunk:
+                loads[key] = self._loads.start(key, lambda key=key, batch=batch: self._load_from_batch(batch, key))
+        return loads
+
+    async def _load_many(self, keys: List[str]) -> Dict[str, Optional[V]]:
+        values = await self._fetch_many(keys)
+        found = {key: value for key, value in values.items() if value is not None}
+        if found:
+            async with AsyncSessionLocal() as db:
+                for key, value in found.items():
+                    await self._write_snapshot(db, key, value)
+                await db.commit()
+            fetched_at = datetime.now(timezone.utc)
+            for key, value in found.items():
+                self._remember(key, (fetched_at, value))
+        return values
+
+    @staticmethod
+    async def _load_from_batch(batch: asyncio.Task, key: str) -> Optional[V]:
+        return (await batch).get(key)
+
+    def _log_failure(self, key: str, error: BaseException):
+        print(f"[EMOTE CACHE] Refresh of {self._name} {key} failed: {str(error)}")
+
+
+def raise_for_seventv_status(response):
+    if response.status_code != 200:
+        print(f"7TV API Error - Status: {response.status_code}")
+        print(f"Response body: {response.text}")
+        response.raise_for_status()
+
+
+# Emote sets, by set id
+
+async def fetch_emote_set(emote_set_id: str) -> Optional[dict]:
+    query = f"""
+        {{
+            emoteSet(id: "{emote_set_id}") {{
+                id
+                name
+                emotes {{
+                    id
+                    name
+                }}
+            }}
+
+        }}
+    """
+    response = await post_seventv_gql(query)
+    raise_for_seventv_status(response)
+    data = response.json().get("data")
+    if not data or not data.get('emoteSet'):
+        return None
+    emote_set = data['emoteSet']
+    return {
+        'id': emote_set['id'],
+        'name': emote_set['name'],
+        'emotes': [{'id': emote['id'], 'name': emote['name']} for emote in emote_set['emotes']]
+    }
+
+
+async def read_emote_set_snapshot(db: AsyncSession, emote_set_id: str) -> Optional[Snapshot]:
+    result = await db.execute(select(EmoteSetSnapshot).where(EmoteSetSnapshot.emote_set_id == emote_set_id))
+    row = result.scalar_one_or_none()
+    if row is None:
+        return None
+    return row.fetched_at, {'id': row.emote_set_id, 'name': row.name, 'emotes': row.emotes}
+
+
+async def write_emote_set_snapshot(db: AsyncSession, emote_set_id: str, emote_set: dict):
+    stmt = pg_insert(EmoteSetSnapshot).values(
+        emote_set_id=emote_set_id, name=emote_set['name'], emotes=emote_set['emotes'],
+        fetched_at=datetime.now(timezone.utc)
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[EmoteSetSnapshot.emote_set_id],
+        set_={'name': stmt.excluded.name, 'emotes': stmt.excluded.emotes, 'fetched_at': stmt.excluded.fetched_at}
+    ))
+
+
+async def expire_emote_set_snapshot(db: AsyncSession, emote_set_id: str):
+    await db.execute(
+        update(EmoteSetSnapshot)
+        .where(EmoteSetSnapshot.emote_set_id == emote_set_id)
+        .values(fetched_at=EXPIRED)
+    )
+
+
+emote_set_cache: TwoTierCache[dict] = TwoTierCache(
+    'emote set', fetch_emote_set, read_emote_set_snapshot, write_emote_set_snapshot, expire_emote_set_snapshot
+)
+
+
+# A 7TV user's emote sets, by 7TV user id
+
+USER_EMOTE_SETS_FIELDS = """
+                    id
+                    username
+                    emote_sets {
+                        id
+                        name
+                        emotes {
+                            id
+                            name
+                        }
+                    }
+                    connections {
+                        id
+                        platform
+                    }
+"""
+
+
+def user_emote_sets_from(user: Optional[dict]) -> Optional[list]:
+    if not user:
+        return None
+    return [
+        {
+            'id': emote_set['id'],
+            'name': emote_set['name'],
+            'preview_emotes': emote_set['emotes'][:3]
+        }
+        for emote_set in user['emote_sets']
+    ]
+
+
+async def fetch_user_emote_sets(seventv_user_id: str) -> Optional[list]:
+    query = f"""
+            {{
+                user(id: "{seventv_user_id}") {{{USER_EMOTE_SETS_FIELDS}                }}
+            }}
+            """
+    response = await post_seventv_gql(query)
+    raise_for_seventv_status(response)
+    data = response.json().get("data")
+    return user_emote_sets_from(data.get('user') if data else None)
+
+
+async def fetch_many_user_emote_sets(seventv_user_ids: List[str]) -> Dict[str, Optional[list]]:
+    """Several users in one GraphQL document, one aliased user field each"""
+    fields = "".join(
+        f"""
+                u{index}: user(id: "{seventv_user_id}") {{{USER_EMOTE_SETS_FIELDS}                }}"""
+        for index, seventv_user_id in enumerate(seventv_user_ids)
+    )
+    query = f"""
+            {{{fields}
+            }}
+            """
+    response = await post_seventv_gql(query)
+    raise_for_seventv_status(response)
+    # An unknown id only nulls its own field
+    data = response.json().get("data") or {}
+    return {
+        seventv_user_id: user_emote_sets_from(data.get(f'u{index}'))
+        for index, seventv_user_id in enumerate(seventv_user_ids)
+    }
+
+
+async def read_user_emote_sets_snapshot(db: AsyncSession, seventv_user_id: str) -> Optional[Snapshot]:
+    result = await db.execute(
+        select(SevenTVUserEmoteSets).where(SevenTVUserEmoteSets.seventv_user_id == seventv_user_id)
+    )
+    row = result.scalar_one_or_none()
+    if row is None:
+        return None
+    return row.fetched_at, row.emote_sets
+
+
+async def read_user_emote_sets_snapshots(db: AsyncSession, seventv_user_ids: List[str]) -> Dict[str, Snapshot]:
+    result = await db.execute(
+        select(SevenTVUserEmoteSets).where(SevenTVUserEmoteSets.seventv_user_id.in_(seventv_user_ids))
+    )
+    return {row.seventv_user_id: (row.fetched_at, row.emote_sets) for row in result.scalars().all()}
+
+
+async def write_user_emote_sets_snapshot(db: AsyncSession, seventv_user_id: str, emote_sets: list):
+    stmt = pg_insert(SevenTVUserEmoteSets).values(
+        seventv_user_id=seventv_user_id, emote_sets=emote_sets, fetched_at=datetime.now(timezone.utc)
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[SevenTVUserEmoteSets.seventv_user_id],
+        set_={'emote_sets': stmt.excluded.emote_sets, 'fetched_at': stmt.excluded.fetched_at}
+    ))
+
+
+async def expire_user_emote_sets_snapshot(db: AsyncSession, seventv_user_id: str):
+    await db.execute(
+        update(SevenTVUserEmoteSets)
+        .where(SevenTVUserEmoteSets.seventv_user_id == seventv_user_id)
+        .values(fetched_at=EXPIRED)
+    )
+
+
+user_emote_sets_cache: TwoTierCache[list] = TwoTierCache(
+    'user emote sets', fetch_user_emote_sets,
+    read_user_emote_sets_snapshot, write_user_emote_sets_snapshot, expire_user_emote_sets_snapshot,
+    fetch_many=fetch_many_user_emote_sets, read_snapshots=read_user_emote_sets_snapshots
+)
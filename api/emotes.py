@@ -3,93 +3,74 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database import get_database
 from models import User
+from api.mods import get_moderated_channels
+from api.emote_set_cache import emote_set_cache, user_emote_sets_cache
 import httpx
-import pprint
-import os
-import asyncio
 from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
 @router.get('/emotes/emote_sets/{user_id}')
 async def get_emote_sets(user_id: str) -> dict:
-    query = f"""
-            {{ 
-                user(id: "{user_id}") {{
-                    id
-                    username
-                    emote_sets {{
-                        id
-                        name
-                        emotes {{
-                            id
-                            name
-                        }}
-                    }}
-                    connections {{
-                        id
-                        platform
-                    }}
-                }}
-            }}
-            """
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://7tv.io/v3/gql", json={"query": query})
-        data = response.json().get("data")
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail='7TV API error')
-        elif not data or not data.get('user'):
-            raise HTTPException(status_code=404, detail='user not found')
-        else: 
-            emote_sets = [
-                {
-                    'id': emote_set['id'],
-                    'name': emote_set['name'],
-                    'preview_emotes': emote_set['emotes'][:3]
-                }
-                for emote_set in data['user']['emote_sets']
-            ]
-
-            return {'emote_sets': emote_sets}
+    try:
+        emote_sets = await user_emote_sets_cache.get(user_id)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail='7TV API error')
+    if emote_sets is None:
+        raise HTTPException(status_code=404, detail='user not found')
+    return {'emote_sets': emote_sets}
 
 @router.get('/emotes/set/{emote_set_id}/emotes')
 async def get_emotes_from_set(emote_set_id: str):
-    query = f"""
-        {{
-            emoteSet(id: "{emote_set_id}") {{
-                id
-                name
-                emotes {{
-                    id
-                    name 
-                }}
-            }}
+    try:
+        emote_set = await emote_set_cache.get(emote_set_id)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=500, detail=f'7TV API error: {e.response.status_code}')
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail='7TV API error')
+    if emote_set is None:
+        raise HTTPException(status_code=404, detail='emote set not found')
+    return {'emotes': emote_set['emotes']}
+
+async def managed_seventv_ids(request: Request, db: AsyncSession) -> Optional[List[str]]:
+    """7TV ids of the signed-in user's own channel and the channels they moderate, or None if signed out."""
+    user_session = request.session.get('user')
+    if not user_session:
+        return None
+    result = await db.execute(select(User).where(User.twitch_user_id == user_session['id']))
+    user = result.scalar_one_or_none()
+    if not user:
+        return None
+    seventv_ids = [user.sevenTV_id] + [seventv_id for _, seventv_id in await get_moderated_channels(db, user.id)]
+    return [seventv_id for seventv_id in seventv_ids if seventv_id and not seventv_id.startswith("no_account_")]
 
-        }}
-    """
-    timeout = httpx.Timeout(10.0, connect=5.0)  # 10s total, 5s to connect
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post("https://7tv.io/v3/gql", json={"query": query})
-        if response.status_code != 200:
-            print(f"7TV API Error - Status: {response.status_code}")
-            print(f"Response body: {response.text}")
-            raise HTTPException(status_code=500, detail=f'7TV API error: {response.status_code}')
-            
-        data = response.json().get("data")
+@router.post('/emotes/set/{emote_set_id}/refresh')
+async def refresh_emote_set(emote_set_id: str, request: Request, db: AsyncSession = Depends(get_database)):
+    """Drop the cached copy of an emote set (e.g. after editing it on 7TV) and fetch it again"""
+    seventv_ids = await managed_seventv_ids(request, db)
+    if seventv_ids is None:
+        return {"success": False, "message": "User not authenticated"}
+    # Only sets belonging to the user's channel or a channel they moderate
+    emote_sets = await user_emote_sets_cache.get_many(seventv_ids)
+    if not any(emote_set['id'] == emote_set_id for sets in emote_sets.values() if sets for emote_set in sets):
+        return {"success": False, "message": "Permission denied: cannot refresh this emote set"}
+    await emote_set_cache.invalidate(emote_set_id)
+    result = await get_emotes_from_set(emote_set_id)
+    return {"success": True, **result}
 
-        if not data or not data.get('emoteSet'):
-            raise HTTPException(status_code=404, detail='emote set not found')
-        else:
-            emotes = [
-                {
-                    'id': emote['id'],
-                    'name': emote['name']
-                } 
-                for emote in data['emoteSet']['emotes']
-            ]
-        
-            return {'emotes': emotes}
-        
+@router.post('/emotes/emote_sets/{user_id}/refresh')
+async def refresh_emote_sets(user_id: str, request: Request, db: AsyncSession = Depends(get_database)):
+    """Drop the cached list of a 7TV user's emote sets and fetch it again"""
+    seventv_ids = await managed_seventv_ids(request, db)
+    if seventv_ids is None:
+        return {"success": False, "message": "User not authenticated"}
+    if user_id not in seventv_ids:
+        return {"success": False, "message": "Permission denied: cannot refresh this user's emote sets"}
+    await user_emote_sets_cache.invalidate(user_id)
+    result = await get_emote_sets(user_id)
+    return {"success": True, **result}
+    
 @router.get('/emotes/mod-list')
 async def get_mod_list(request: Request, db: AsyncSession = Depends(get_database)):
     user_session = request.session.get('user')
@@ -101,52 +82,32 @@ async def get_mod_list(request: Request, db: AsyncSession = Depends(get_database
     if not user:
         return {"success": False, "message": "User not found in database"}
 
-    if not user.can_create_votes_for or len(user.can_create_votes_for) == 0:
+    mod_channels = await get_moderated_channels(db, user.id)
+    if not mod_channels:
         return {"success": True, "message": "User is not a mod anywhere", "mod_channels": []}
 
-    BASE_URL = os.getenv("BASE_URL")
-    
-    # OPTIMIZATION #3: Parallelize mod list fetching
-    parallel_start_time = datetime.now()
-    print(f"[PARALLEL MOD FETCH] Starting to fetch emote sets for {len(user.can_create_votes_for)} mod channels...")
-    
-    # Get all mod usernames (already checked above that it's not empty)
-    mod_usernames = user.can_create_votes_for
-    
-    # Create tasks for parallel fetching
-    async def fetch_channel_emotes(mod_for_username):
-        try:
-            # Get the user from database
-            result = await db.execute(select(User).where(User.twitch_username == mod_for_username))
-            mod_for_user = result.scalar_one_or_none()
-            
-            # Skip if not found or no 7TV ID
-            if not mod_for_user or not mod_for_user.sevenTV_id or mod_for_user.sevenTV_id.startswith("no_account_"):
-                return None
-                
-            # Use the existing function!
-            emote_sets_data = await get_emote_sets(mod_for_user.sevenTV_id)
-            
-            # Return result
-            return {
-                'channel_username': mod_for_username,
-                'emote_sets': emote_sets_data['emote_sets']
-            }
-        except Exception as e:
-            print(f"Error fetching emote sets for {mod_for_username}: {str(e)}")
-            return None
-    
-    # Fetch all channels in parallel
-    results = await asyncio.gather(*[fetch_channel_emotes(username) for username in mod_usernames])
-    
-    # Filter out None results (failed or skipped channels)
-    channels_and_emotes = [result for result in results if result is not None]
-    
-    parallel_end_time = datetime.now()
-    parallel_duration = (parallel_end_time - parallel_start_time).total_seconds() * 1000
-    print(f"[PARALLEL MOD FETCH] Completed fetching {len(channels_and_emotes)} channels in {parallel_duration:.2f}ms (parallel)")
-    print(f"[PARALLEL MOD FETCH] Fetched {len(channels_and_emotes)} of {len(mod_usernames)} channels successfully")
-    
+    # Channels without a 7TV account have nothing to pick from
+    seventv_ids = {
+        username: seventv_id for username, seventv_id in mod_channels
+        if seventv_id and not seventv_id.startswith("no_account_")
+    }
+
+    # One snapshot query and one 7TV request (per EMOTE_SET_CACHE_BATCH_SIZE
+    # channels) for whatever isn't cached, instead of a round trip per channel
+    fetch_start_time = datetime.now()
+    emote_sets = await user_emote_sets_cache.get_many(list(seventv_ids.values()))
+    channels_and_emotes = [
+        {
+            'channel_username': username,
+            'emote_sets': emote_sets[seventv_id]
+        }
+        for username, seventv_id in seventv_ids.items()
+        if emote_sets.get(seventv_id) is not None
+    ]
+
+    fetch_duration = (datetime.now() - fetch_start_time).total_seconds() * 1000
+    print(f"[MOD FETCH] Fetched {len(channels_and_emotes)} of {len(mod_channels)} channels in {fetch_duration:.2f}ms")
+
     return {
         "success": True,
         "mod_channels": channels_and_emotes
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import select, update, func
+from database import AsyncSessionLocal
+from models import VotingEvent
+
+# Flips voting_events.is_active to false when events end, so request handlers
+# never have to write. Upcoming end times sit in a min-heap and the scheduler
+# sleeps until the earliest one, then expires everything due in one UPDATE.
+# Deadlines are reloaded from the database every EXPIRY_RESCAN_SECONDS to pick
+# up events created or edited by other workers.
+EXPIRY_RESCAN_SECONDS = float(os.getenv('EXPIRY_RESCAN_SECONDS', '60'))
+EXPIRY_PRELOAD_LIMIT = int(os.getenv('EXPIRY_PRELOAD_LIMIT', '1000'))
+EXPIRY_RETRY_SECONDS = 5
+
+Deadline = Tuple[datetime, int]  # (end time, event id)
+
+
+class EventExpiryScheduler:
+    def __init__(self):
+        self._deadlines: List[Deadline] = []
+        self._scheduled: Set[Deadline] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def schedule(self, event_id: int, end_time: Optional[datetime]):
+        """Make sure the scheduler wakes up at end_time. Stale entries are harmless."""
+        if end_time is None:
+            return
+        deadline = (end_time, event_id)
+        if deadline in self._scheduled:
+            return
+        self._scheduled.add(deadline)
+        heapq.heappush(self._deadlines, deadline)
+        if self._deadlines[0] == deadline:
+            self._wakeup.set()
+
+    async def _load_deadlines(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(VotingEvent.id, VotingEvent.effective_end_time)
+                .where(VotingEvent.is_active.is_(True), VotingEvent.effective_end_time > func.now())
+                .order_by(VotingEvent.effective_end_time)
+                .limit(EXPIRY_PRELOAD_LIMIT)
+            )
+            for event_id, end_time in result.all():
+                self.schedule(event_id, end_time)
+
+    async def expire_due_events(self) -> List[int]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(VotingEvent)
+                .where(VotingEvent.is_active.is_(True), VotingEvent.effective_end_time <= func.now())
+                .values(is_active=False)
+                .returning(VotingEvent.id)
+            )
+            expired_ids = result.scalars().all()
+            await db.commit()
+        if expired_ids:
+            print(f"[EXPIRY] Expired {len(expired_ids)} events: {expired_ids}")
+        return expired_ids
+
+    def _pop_due(self) -> bool:
+        now = datetime.now(timezone.utc)
+        due = False
+        while self._deadlines and self._deadlines[0][0] <= now:
+            self._scheduled.discard(heapq.heappop(self._deadlines))
+            due = True
+        return due
+
+    def _seconds_until_next(self, next_rescan: float) -> float:
+        timeout = next_rescan - time.monotonic()
+        if self._deadlines:
+            until_deadline = (self._deadlines[0][0] - datetime.now(timezone.utc)).total_seconds()
+            timeout = min(timeout, until_deadline)
+        return max(timeout, 0)
+
+    async def _run(self):
+        next_rescan = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_rescan:
+                    # Also sweeps anything that ended while no worker was watching
+                    await self.expire_due_events()
+                    await self._load_deadlines()
+                    next_rescan = time.monotonic() + EXPIRY_RESCAN_SECONDS
+                if self._pop_due():
+                    await self.expire_due_events()
+            except Exception as e:
+                print(f"[EXPIRY] Expiry pass failed, retrying in {EXPIRY_RETRY_SECONDS}s: {str(e)}")
+                next_rescan = time.monotonic() + EXPIRY_RETRY_SECONDS
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._seconds_until_next(next_rescan))
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+expiry_scheduler: Optional[EventExpiryScheduler] = None
+
+
+def schedule_event_expiry(event_id: int, end_time: Optional[datetime]):
+    if expiry_scheduler is not None:
+        expiry_scheduler.schedule(event_id, end_time)
+
+
+def start_expiry_scheduler():
+    global expiry_scheduler
+    expiry_scheduler = EventExpiryScheduler()
+    expiry_scheduler.start()
+
+
+async def stop_expiry_scheduler():
+    global expiry_scheduler
+    if expiry_scheduler is None:
+        return
+    await expiry_scheduler.stop()
+    expiry_scheduler = None
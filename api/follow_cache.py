@@ -0,0 +1,70 @@
+import os
+import time
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional, Tuple
+from api.single_flight import SingleFlight
+
+# Per-worker cache of the broadcaster IDs each user follows. Fetching the list
+# means paging Helix 100 channels at a time, so it is kept for
+# FOLLOW_CACHE_TTL_SECONDS. After that it is still served for up to
+# FOLLOW_CACHE_STALE_SECONDS while one background refresh replaces it; only a
+# user with no usable entry waits on Twitch, and concurrent misses share a load.
+FOLLOW_CACHE_TTL_SECONDS = float(os.getenv('FOLLOW_CACHE_TTL_SECONDS', '300'))
+FOLLOW_CACHE_STALE_SECONDS = float(os.getenv('FOLLOW_CACHE_STALE_SECONDS', '3600'))
+FOLLOW_CACHE_MAX_USERS = int(os.getenv('FOLLOW_CACHE_MAX_USERS', '10000'))
+
+FollowedChannels = FrozenSet[str]  # broadcaster twitch_user_ids
+# Takes a users.id and whether nobody is waiting on the result (a background
+# refresh); returns None when the user has no token to ask Twitch with
+FollowLoader = Callable[[int, bool], Awaitable[Optional[FollowedChannels]]]
+
+
+class FollowCache:
+    def __init__(self, loader: FollowLoader, ttl_seconds: float, stale_seconds: float, max_users: int):
+        self._loader = loader
+        self._ttl = ttl_seconds
+        self._stale = stale_seconds
+        self._max_users = max_users
+        self._entries: Dict[int, Tuple[float, FollowedChannels]] = {}
+        self._loads = SingleFlight(on_error=self._log_failure)
+
+    def peek(self, user_id: int) -> Optional[FollowedChannels]:
+        """The cached set if it is still fresh, without touching Twitch."""
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < self._ttl:
+            return entry[1]
+        return None
+
+    async def get(self, user_id: int) -> Optional[FollowedChannels]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self._ttl:
+                return entry[1]
+            if age < self._ttl + self._stale:
+                self._loads.start(user_id, lambda: self._load(user_id, background=True))
+                return entry[1]
+        return await self._loads.do(user_id, lambda: self._load(user_id, background=False))
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    async def _load(self, user_id: int, background: bool) -> Optional[FollowedChannels]:
+        followed = await self._loader(user_id, background)
+        if followed is not None:
+            self._store(user_id, followed)
+        return followed
+
+    @staticmethod
+    def _log_failure(user_id: int, error: BaseException):
+        print(f"[FOLLOW CACHE] Refresh for user {user_id} failed: {str(error)}")
+
+    def _store(self, user_id: int, followed: FollowedChannels):
+        if len(self._entries) >= self._max_users and user_id not in self._entries:
+            now = time.monotonic()
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if now - entry[0] < self._ttl + self._stale
+            }
+            if len(self._entries) >= self._max_users:
+                del self._entries[min(self._entries, key=lambda key: self._entries[key][0])]
+        self._entries[user_id] = (time.monotonic(), followed)
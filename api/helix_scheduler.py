@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import httpx
+from api.http_client import get_http_client
+from api.single_flight import SingleFlight
+
+# Every Helix request goes through here. Twitch rate limits per token (user
+# tokens) and per client id, and reports the state of that bucket on each
+# response (Ratelimit-Limit / -Remaining / -Reset). A local token bucket per
+# Authorization header mirrors it: requests take a point before going out,
+# wait in priority order when the bucket is empty, and a 429 is retried after a
+# jittered backoff instead of surfacing as "access denied".
+HELIX_DEFAULT_POINTS_PER_MINUTE = int(os.getenv('HELIX_DEFAULT_POINTS_PER_MINUTE', '800'))
+HELIX_MAX_RETRIES = int(os.getenv('HELIX_MAX_RETRIES', '3'))
+HELIX_BACKOFF_BASE_SECONDS = float(os.getenv('HELIX_BACKOFF_BASE_SECONDS', '0.5'))
+HELIX_MAX_WAIT_SECONDS = float(os.getenv('HELIX_MAX_WAIT_SECONDS', '10'))
+HELIX_MAX_BUCKETS = int(os.getenv('HELIX_MAX_BUCKETS', '10000'))
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0  # access checks a viewer is waiting on
+PRIORITY_BACKGROUND = 1   # cache refreshes nobody is waiting on
+
+RATE_LIMITED = 429
+
+
+class RateLimitBucket:
+    def __init__(self, points_per_minute: int):
+        self.limit = points_per_minute
+        self.tokens = float(points_per_minute)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # monotonic; Ratelimit-Reset once Twitch reports 0 remaining
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.blocked_until and now >= self.blocked_until:
+            # Ratelimit-Reset is when Twitch's bucket is full again
+            self.tokens = float(self.limit)
+            self.blocked_until = 0.0
+        else:
+            self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / 60)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        if time.monotonic() < self.blocked_until:
+            return False
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill()
+        return max(0.0, (1 - self.tokens) * 60 / self.limit)
+
+    def update_from_headers(self, headers: httpx.Headers):
+        try:
+            limit = int(headers['Ratelimit-Limit'])
+            remaining = int(headers['Ratelimit-Remaining'])
+        except (KeyError, ValueError):
+            return
+        self._refill()
+        self.limit = max(limit, 1)
+        # Twitch's count is authoritative but doesn't know about requests
+        # still in flight, so never raise the local estimate from it
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0:
+            self.block_until_reset(headers)
+
+    def block_until_reset(self, headers: httpx.Headers) -> float:
+        """Stop handing out points until Ratelimit-Reset. Returns the wait in seconds."""
+        try:
+            wait = float(headers['Ratelimit-Reset']) - time.time()
+        except (KeyError, ValueError):
+            wait = 0.0
+        wait = min(max(wait, 0.0), HELIX_MAX_WAIT_SECONDS)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+        self.tokens = 0
+        return wait
+
+
+class HelixScheduler:
+    def __init__(self):
+        self._buckets: Dict[str, RateLimitBucket] = {}
+        self._sequence = itertools.count()
+
+    def _bucket(self, key: str) -> RateLimitBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= HELIX_MAX_BUCKETS:
+                self._prune()
+            bucket = RateLimitBucket(HELIX_DEFAULT_POINTS_PER_MINUTE)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _prune(self):
+        # Idle buckets have refilled completely, so forgetting them loses nothing
+        idle_after = time.monotonic() - 60
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket.waiters or bucket.updated > idle_after
+        }
+
+    async def _acquire(self, bucket: RateLimitBucket, priority: int):
+        if not bucket.waiters and bucket.try_take():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(bucket.waiters, (priority, next(self._sequence), future))
+        self._wake(bucket)
+        await future
+
+    def _wake(self, bucket: RateLimitBucket):
+        if bucket.timer is not None:
+            bucket.timer.cancel()
+            bucket.timer = None
+        while bucket.waiters:
+            if bucket.waiters[0][2].done():
+                # Caller was cancelled while queued
+                heapq.heappop(bucket.waiters)
+                continue
+            if not bucket.try_take():
+                break
+            heapq.heappop(bucket.waiters)[2].set_result(None)
+        if bucket.waiters:
+            bucket.timer = asyncio.get_running_loop().call_later(
+                bucket.seconds_until_available(), self._wake, bucket
+            )
+
+    async def request(self, method: str, url: str, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> httpx.Response:
+        headers = kwargs.get('headers') or {}
+        bucket = self._bucket(f"{headers.get('Client-Id')}:{headers.get('Authorization')}")
+        client = get_http_client()
+
+        for attempt in range(HELIX_MAX_RETRIES + 1):
+            await self._acquire(bucket, priority)
+            response = await client.request(method, url, **kwargs)
+            bucket.update_from_headers(response.headers)
+            if response.status_code != RATE_LIMITED or attempt == HELIX_MAX_RETRIES:
+                return response
+
+            # Wait out the reset, spread so queued retries don't land together
+            wait = bucket.block_until_reset(response.headers)
+            backoff = max(wait, HELIX_BACKOFF_BASE_SECONDS * 2 ** attempt)
+            backoff *= random.uniform(1, 1.5)
+            print(f"[HELIX] 429 from {url}, retrying in {backoff:.2f}s (attempt {attempt + 1}/{HELIX_MAX_RETRIES})")
+            await asyncio.sleep(backoff)
+        return response
+
+
+helix_scheduler = HelixScheduler()
+helix_calls = SingleFlight()
+
+
+async def helix_get(url: str, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> httpx.Response:
+    # Identical GETs (same endpoint, params and token) in flight at once share
+    # one request and one rate-limit point
+    headers = kwargs.get('headers') or {}
+    key = (
+        str(httpx.URL(url, params=kwargs.get('params'))),
+        headers.get('Client-Id'),
+        headers.get('Authorization')
+    )
+    return await helix_calls.do(key, lambda: helix_scheduler.request("GET", url, priority, **kwargs))
@@ -0,0 +1,89 @@
+import importlib.util
+import os
+from typing import Dict, Optional
+import httpx
+
+# One pooled client per worker for every Twitch and 7TV call, so requests reuse
+# warm keep-alive connections instead of paying a TCP+TLS handshake each time.
+# Each upstream host gets its own transport and connection limit so a burst of
+# 7TV lookups can't starve Helix calls (and vice versa).
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', '10'))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', '5'))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', '20'))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv('HTTP_MAX_KEEPALIVE_PER_HOST', '10'))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', '30'))
+# HTTP/2 uses the h2 package from httpx[http2] in requirements.txt
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'true').lower() == 'true'
+
+UPSTREAM_HOSTS = ('api.twitch.tv', 'id.twitch.tv', '7tv.io')
+DEFAULT_POOL = 'default'
+
+http_client: Optional[httpx.AsyncClient] = None
+transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    if importlib.util.find_spec('h2') is None:
+        print("[HTTP] HTTP2_ENABLED is set but the h2 package is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = _http2_available()
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=HTTP_KEEPALIVE_SECONDS
+    )
+    transports.clear()
+    for host in (DEFAULT_POOL,) + UPSTREAM_HOSTS:
+        transports[host] = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        transport=transports[DEFAULT_POOL],
+        mounts={f"all://{host}": transports[host] for host in UPSTREAM_HOSTS}
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client for upstream calls. Don't close it; the lifespan owns it."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        # Outside the app lifespan (scripts, one-off tasks) create it on demand
+        http_client = _build_client()
+    return http_client
+
+
+def start_http_client():
+    global http_client
+    http_client = _build_client()
+
+
+async def stop_http_client():
+    global http_client
+    if http_client is None:
+        return
+    await http_client.aclose()
+    http_client = None
+    transports.clear()
+
+
+def get_http_pool_stats() -> dict:
+    pools = {}
+    for host, transport in transports.items():
+        # httpx doesn't expose the pool publicly; httpcore's pool does
+        connections = getattr(getattr(transport, '_pool', None), 'connections', [])
+        pools[host] = {
+            'connections': len(connections),
+            'idle': sum(1 for conn in connections if conn.is_idle()),
+            'http2': sum(1 for conn in connections if 'HTTP/2' in conn.info()),
+        }
+    return {
+        'started': http_client is not None and not http_client.is_closed,
+        'max_connections_per_host': HTTP_MAX_CONNECTIONS_PER_HOST,
+        'pools': pools
+    }
@@ -1,9 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from models import PendingPermissions, User
+from sqlalchemy import select, delete, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import PendingPermissions, User, ChannelModerator
 from fastapi import APIRouter, HTTPException, Depends, Request
 from database import get_database
 from pydantic import BaseModel
+from typing import List, Optional, Tuple
 
 
 router = APIRouter()
@@ -14,6 +16,35 @@ class AddModRequest(BaseModel):
 class RemoveModRequest(BaseModel):
     username: str 
 
+def is_moderator_of(channel_user_id, moderator_user_id):
+    """EXISTS condition for "moderator_user_id is on channel_user_id's mod team".
+
+    Takes values or columns, so it works both as a standalone check and
+    correlated inside a bigger query.
+    """
+    return exists().where(
+        ChannelModerator.channel_user_id == channel_user_id,
+        ChannelModerator.moderator_user_id == moderator_user_id
+    )
+
+async def user_moderates_channel(db: AsyncSession, channel_user_id: int, moderator_user_id: int) -> bool:
+    result = await db.execute(select(is_moderator_of(channel_user_id, moderator_user_id)))
+    return bool(result.scalar())
+
+async def get_moderated_channels(db: AsyncSession, moderator_user_id: int) -> List[Tuple[str, Optional[str]]]:
+    """(username, 7TV id) of the channels this user can create votes for, in one query."""
+    result = await db.execute(
+        select(User.twitch_username, User.sevenTV_id)
+        .join(ChannelModerator, ChannelModerator.channel_user_id == User.id)
+        .where(ChannelModerator.moderator_user_id == moderator_user_id)
+        .order_by(ChannelModerator.created_at, User.twitch_username)
+    )
+    return [tuple(row) for row in result.all()]
+
+async def get_moderated_channel_usernames(db: AsyncSession, moderator_user_id: int) -> List[str]:
+    """Usernames of the channels this user can create votes for."""
+    return [username for username, _ in await get_moderated_channels(db, moderator_user_id)]
+
 @router.get('/mods/list')
 async def list_mods(request: Request, db: AsyncSession = Depends(get_database)):
     user_id = request.session.get('user_id')
@@ -25,10 +56,27 @@ async def list_mods(request: Request, db: AsyncSession = Depends(get_database)):
     if not user:
         return {"success": False, "message": "User not found in database"}
 
-    if not user.moderators:
+    result = await db.execute(
+        select(User.twitch_username)
+        .join(ChannelModerator, ChannelModerator.moderator_user_id == User.id)
+        .where(ChannelModerator.channel_user_id == user.id)
+        .order_by(ChannelModerator.created_at, User.twitch_username)
+    )
+    moderators = list(result.scalars().all())
+
+    # Mods without an account yet still show up on the team
+    result = await db.execute(
+        select(PendingPermissions.twitch_username)
+        .where(PendingPermissions.granted_by_user_id == user.id)
+        .where(PendingPermissions.permission_type == "moderator")
+        .order_by(PendingPermissions.created_at)
+    )
+    moderators += [username for username in result.scalars().all() if username not in moderators]
+
+    if not moderators:
         return {"success": True, "message": "User has no moderators", "moderators": []}
     
-    return {"success": True, "message": None, "moderators": user.moderators}
+    return {"success": True, "message": None, "moderators": moderators}
 
 @router.delete('/mods/remove')
 async def remove_mod(mod_data: RemoveModRequest, request: Request, db: AsyncSession = Depends(get_database)):
@@ -42,29 +90,28 @@ async def remove_mod(mod_data: RemoveModRequest, request: Request, db: AsyncSess
         return {"success": False, "message": "User not found in database"}
 
     mod_username = mod_data.username
-    if user.moderators and mod_username not in user.moderators:
-        return {"success": False, "message": "Mod not found on your mod list"}
-    
-    result = await db.execute(select(User).where(User.twitch_username == mod_username))
-    mod = result.scalar_one_or_none()
 
-    if user.moderators and mod_username in user.moderators:
-        user.moderators.remove(mod_username)
-        from sqlalchemy.orm import attributes
-        attributes.flag_modified(user, 'moderators')  # ← ADD THIS
-        
-    if mod and mod.can_create_votes_for and user.twitch_username in mod.can_create_votes_for:
-        mod.can_create_votes_for.remove(user.twitch_username)
-        attributes.flag_modified(mod, 'can_create_votes_for')  # ← ADD THIS
+    # Single-row deletes against the (channel, mod) key; no read-modify-write
+    result = await db.execute(
+        delete(ChannelModerator)
+        .where(ChannelModerator.channel_user_id == user.id)
+        .where(ChannelModerator.moderator_user_id.in_(
+            select(User.id).where(User.twitch_username == mod_username).scalar_subquery()
+        ))
+    )
+    removed = result.rowcount
 
     result = await db.execute(
-        select(PendingPermissions)
+        delete(PendingPermissions)
         .where(PendingPermissions.twitch_username == mod_username)
         .where(PendingPermissions.granted_by_user_id == user.id)
     )
-    pending = result.scalar_one_or_none()
-    if pending:
-        await db.delete(pending)
+    removed += result.rowcount
+
+    if not removed:
+        await db.rollback()
+        return {"success": False, "message": "Mod not found on your mod list"}
+
     await db.commit()
     return {"success": True, "message": "Mod removed successfully"}
 
@@ -72,65 +119,47 @@ async def remove_mod(mod_data: RemoveModRequest, request: Request, db: AsyncSess
 @router.post('/mods/add')
 async def add_mod(mod_data: AddModRequest, request: Request, db: AsyncSession = Depends(get_database)):
     user_id = request.session.get('user_id')
-    print(f"DEBUG: user_id from session: {user_id}")
     if not user_id:
         return {"success": False, "message": "User not signed in"}
 
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
-    print(f"DEBUG: Found user: {user.twitch_username if user else 'None'}")
-    print(f"DEBUG: Current moderators: {user.moderators if user else 'None'}")
     if not user:
         return {"success": False, "message": "User not found in database"}
 
     potential_mod_username = mod_data.username
-    print(f"DEBUG: Trying to add: {potential_mod_username}")
-    if user.moderators and potential_mod_username in user.moderators:
-        return {"success": False, "message": "Potential mod is already on your mod team"}
         
     result = await db.execute(select(User).where(User.twitch_username == potential_mod_username))
     potential_mod = result.scalar_one_or_none()
-    print(f"DEBUG: Potential mod exists in DB: {potential_mod is not None}")
     
     if not potential_mod:
+        result = await db.execute(
+            select(PendingPermissions.id)
+            .where(PendingPermissions.twitch_username == potential_mod_username)
+            .where(PendingPermissions.granted_by_user_id == user.id)
+        )
+        if result.first():
+            return {"success": False, "message": "Potential mod is already on your mod team"}
+
         new_pending = PendingPermissions(
             twitch_username = potential_mod_username,
             granted_by_user_id = user.id,
             permission_type = "moderator",
         )
         db.add(new_pending)
-        
-        # ALSO add to the current user's moderators list
-        if user.moderators is None:
-            user.moderators = [potential_mod_username]
-        else:
-            user.moderators.append(potential_mod_username)
-        
-        from sqlalchemy.orm import attributes
-        attributes.flag_modified(user, 'moderators')  # ← ADD THIS
-        
-        print(f"DEBUG: After adding, moderators: {user.moderators}")
         await db.commit()
-        print(f"DEBUG: Committed to database")
         return {"success": True, "message": "Potential mod will be granted permissions once they make an account"}
 
-    elif potential_mod:
-        if potential_mod.can_create_votes_for is None:
-            potential_mod.can_create_votes_for = [user.twitch_username]
-        else:
-            potential_mod.can_create_votes_for.append(user.twitch_username)
-        
-        from sqlalchemy.orm import attributes
-        attributes.flag_modified(potential_mod, 'can_create_votes_for')  # ← ADD THIS
-        
-        if user.moderators is None:
-            user.moderators = [potential_mod_username]
-        else:
-            user.moderators.append(potential_mod_username)
-        
-        attributes.flag_modified(user, 'moderators')  # ← ADD THIS
-        
-        print(f"DEBUG: After adding, moderators: {user.moderators}")
-        await db.commit()
-        print(f"DEBUG: Committed to database")
-        return {"success": True, "message": "Potential mod is now on your mod team"}
\ No newline at end of file
+    # ON CONFLICT makes concurrent adds of the same mod safe
+    result = await db.execute(
+        pg_insert(ChannelModerator)
+        .values(channel_user_id=user.id, moderator_user_id=potential_mod.id)
+        .on_conflict_do_nothing()
+        .returning(ChannelModerator.moderator_user_id)
+    )
+    if result.first() is None:
+        await db.rollback()
+        return {"success": False, "message": "Potential mod is already on your mod team"}
+
+    await db.commit()
+    return {"success": True, "message": "Potential mod is now on your mod team"}
@@ -0,0 +1,17 @@
+import httpx
+from api.http_client import get_http_client
+from api.single_flight import SingleFlight
+
+SEVENTV_GQL_URL = "https://7tv.io/v3/gql"
+
+# When a voting link goes out, hundreds of viewers ask 7TV for the same set
+# within seconds; identical queries share one request
+seventv_calls = SingleFlight()
+
+
+async def post_seventv_gql(query: str) -> httpx.Response:
+    async def post():
+        client = get_http_client()
+        return await client.post(SEVENTV_GQL_URL, json={"query": query})
+
+    return await seventv_calls.do(query, post)
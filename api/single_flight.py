@@ -0,0 +1,46 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight call and its result
+    (or exception). Nothing is kept once it finishes; this is coalescing, not
+    caching.
+    """
+
+    def __init__(self, on_error: Optional[Callable[[Hashable, BaseException], None]] = None):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._on_error = on_error
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        # A caller going away mustn't cancel the call for everyone else
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        """Join or start the call for key without waiting on it (background refreshes)."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda task: self._finish(key, task))
+        return task
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if task.cancelled():
+            return
+        # Retrieving it also stops a failure every caller abandoned from being
+        # logged as unhandled
+        error = task.exception()
+        if error is not None and self._on_error is not None:
+            self._on_error(key, error)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def in_flight(self) -> int:
+        return len(self._calls)
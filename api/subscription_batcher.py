@@ -0,0 +1,63 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+from api.subscription_cache import BroadcasterToken
+
+# Helix /subscriptions takes up to 100 user_id parameters, so viewer checks
+# against the same broadcaster are collected for SUB_BATCH_WINDOW_MS and sent
+# as one request. A batch that fills up goes out immediately. When a
+# subscriber-only event goes live this turns hundreds of calls on the
+# broadcaster's token into a handful.
+SUB_BATCH_WINDOW_MS = float(os.getenv('SUB_BATCH_WINDOW_MS', '10'))
+SUB_BATCH_MAX_USERS = 100  # Helix limit
+
+# (broadcaster_id, viewer_ids, token) -> the viewer ids that are subscribed,
+# or None if Twitch couldn't answer
+SubscriptionFetcher = Callable[[str, List[str], BroadcasterToken], Awaitable[Optional[FrozenSet[str]]]]
+
+
+class SubscriptionBatcher:
+    def __init__(self, fetcher: SubscriptionFetcher, window_ms: float, max_users: int):
+        self._fetcher = fetcher
+        self._window = window_ms / 1000
+        self._max_users = max_users
+        # broadcaster_id -> (token, viewer_id -> future)
+        self._pending: Dict[str, Tuple[BroadcasterToken, Dict[str, asyncio.Future]]] = {}
+        self._tasks = set()
+
+    async def check(self, broadcaster_id: str, viewer_id: str, token: BroadcasterToken) -> Optional[bool]:
+        """Whether viewer_id subscribes to broadcaster_id; None if unknown."""
+        batch = self._pending.get(broadcaster_id)
+        if batch is None:
+            batch = (token, {})
+            self._pending[broadcaster_id] = batch
+            asyncio.get_running_loop().call_later(self._window, self._flush, broadcaster_id, batch)
+
+        waiters = batch[1]
+        future = waiters.get(viewer_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            waiters[viewer_id] = future
+            if len(waiters) >= self._max_users:
+                self._flush(broadcaster_id, batch)
+        # Other callers may be waiting on the same viewer
+        return await asyncio.shield(future)
+
+    def _flush(self, broadcaster_id: str, batch):
+        # The timer can fire after a full batch was already sent
+        if self._pending.get(broadcaster_id) is not batch:
+            return
+        del self._pending[broadcaster_id]
+        task = asyncio.create_task(self._send(broadcaster_id, *batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, broadcaster_id: str, token: BroadcasterToken, waiters: Dict[str, asyncio.Future]):
+        try:
+            subscribed = await self._fetcher(broadcaster_id, list(waiters), token)
+        except Exception as e:
+            print(f"[SUB BATCH] Subscription batch for {broadcaster_id} failed: {str(e)}")
+            subscribed = None
+        for viewer_id, future in waiters.items():
+            if not future.done():
+                future.set_result(None if subscribed is None else viewer_id in subscribed)
@@ -0,0 +1,61 @@
+import os
+import time
+from typing import Dict, Generic, Hashable, NamedTuple, Optional, Tuple, TypeVar
+
+# Per-worker caches for subscriber-only access checks. A viewer's subscription
+# status is kept for SUB_CACHE_HIT_TTL_SECONDS when subscribed and the (usually
+# shorter) SUB_CACHE_MISS_TTL_SECONDS when not, so someone who subscribes gets
+# in soon after. Broadcaster tokens are cached by twitch_user_id so the check
+# doesn't need two database lookups every time.
+SUB_CACHE_HIT_TTL_SECONDS = float(os.getenv('SUB_CACHE_HIT_TTL_SECONDS', '300'))
+SUB_CACHE_MISS_TTL_SECONDS = float(os.getenv('SUB_CACHE_MISS_TTL_SECONDS', '60'))
+SUB_CACHE_MAX_ENTRIES = int(os.getenv('SUB_CACHE_MAX_ENTRIES', '50000'))
+BROADCASTER_TOKEN_CACHE_TTL_SECONDS = float(os.getenv('BROADCASTER_TOKEN_CACHE_TTL_SECONDS', '300'))
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+MISSING = object()
+
+
+class BroadcasterToken(NamedTuple):
+    user_id: int  # users.id of the broadcaster
+    access_token: str
+
+
+class ExpiringCache(Generic[K, V]):
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: Dict[K, Tuple[float, V]] = {}
+
+    def get(self, key: K, default=MISSING):
+        """The cached value, or default (MISSING) if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if time.monotonic() >= entry[0]:
+            del self._entries[key]
+            return default
+        return entry[1]
+
+    def set(self, key: K, value: V, ttl_seconds: float):
+        if len(self._entries) >= self._max_entries and key not in self._entries:
+            now = time.monotonic()
+            self._entries = {k: entry for k, entry in self._entries.items() if entry[0] > now}
+            if len(self._entries) >= self._max_entries:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+
+    def invalidate(self, key: K):
+        self._entries.pop(key, None)
+
+
+# (broadcaster twitch_user_id, viewer twitch_user_id) -> subscribed
+subscription_cache: ExpiringCache[Tuple[str, str], bool] = ExpiringCache(SUB_CACHE_MAX_ENTRIES)
+# broadcaster twitch_user_id -> token, or None if they have no usable token
+broadcaster_token_cache: ExpiringCache[str, Optional[BroadcasterToken]] = ExpiringCache(SUB_CACHE_MAX_ENTRIES)
+
+
+def cache_subscription(broadcaster_id: str, viewer_id: str, subscribed: bool):
+    ttl = SUB_CACHE_HIT_TTL_SECONDS if subscribed else SUB_CACHE_MISS_TTL_SECONDS
+    subscription_cache.set((broadcaster_id, viewer_id), subscribed, ttl)
@@ -0,0 +1,52 @@
+import os
+import time
+from typing import Dict, Optional, Tuple
+from database import AsyncSessionLocal
+from api.single_flight import SingleFlight
+from api.tally_hub import fetch_event_tally_snapshot, EmoteCounts
+
+# Per-worker micro-cache for the shared /votes/{event_id}/tallies aggregate.
+# Entries live for TALLY_CACHE_TTL_SECONDS and concurrent misses for the same
+# event share one read, so however many viewers poll an event the tally query
+# runs about once per TTL per worker.
+TALLY_CACHE_TTL_SECONDS = float(os.getenv('TALLY_CACHE_TTL_SECONDS', '1'))
+TALLY_CACHE_MAX_EVENTS = int(os.getenv('TALLY_CACHE_MAX_EVENTS', '1000'))
+
+TallySnapshot = Tuple[Optional[int], EmoteCounts]  # (tally_version, counts)
+
+
+class TallyCache:
+    def __init__(self, ttl_seconds: float, max_events: int):
+        self._ttl = ttl_seconds
+        self._max_events = max_events
+        self._entries: Dict[int, Tuple[float, TallySnapshot]] = {}
+        self._loads = SingleFlight()
+
+    async def get(self, event_id: int) -> TallySnapshot:
+        entry = self._entries.get(event_id)
+        if entry is not None and time.monotonic() - entry[0] < self._ttl:
+            return entry[1]
+        return await self._loads.do(event_id, lambda: self._load(event_id))
+
+    def invalidate(self, event_id: int):
+        self._entries.pop(event_id, None)
+
+    async def _load(self, event_id: int) -> TallySnapshot:
+        async with AsyncSessionLocal() as db:
+            snapshot = await fetch_event_tally_snapshot(db, event_id)
+        self._store(event_id, snapshot)
+        return snapshot
+
+    def _store(self, event_id: int, snapshot: TallySnapshot):
+        if len(self._entries) >= self._max_events and event_id not in self._entries:
+            now = time.monotonic()
+            self._entries = {
+                key: entry for key, entry in self._entries.items() if now - entry[0] < self._ttl
+            }
+            if len(self._entries) >= self._max_events:
+                # Still full of fresh entries: drop the oldest one
+                del self._entries[min(self._entries, key=lambda key: self._entries[key][0])]
+        self._entries[event_id] = (time.monotonic(), snapshot)
+
+
+tally_cache = TallyCache(TALLY_CACHE_TTL_SECONDS, TALLY_CACHE_MAX_EVENTS)
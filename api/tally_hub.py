@@ -0,0 +1,146 @@
+import asyncio
+import os
+from typing import Dict, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import EventEmoteTally, VotingEvent
+
+# Live tally fan-out for /votes/{event_id}/stream.
+# Each event with at least one subscriber gets one publisher task. Vote writes
+# only mark the event dirty; the publisher reads the tally rows changed since
+# its last read at most TALLY_STREAM_MAX_UPDATES_PER_SECOND times and pushes
+# them to every subscriber, so one DB read feeds any number of viewers.
+TALLY_STREAM_MAX_UPDATES_PER_SECOND = float(os.getenv('TALLY_STREAM_MAX_UPDATES_PER_SECOND', '4'))
+TALLY_STREAM_KEEPALIVE_SECONDS = float(os.getenv('TALLY_STREAM_KEEPALIVE_SECONDS', '15'))
+
+EmoteCounts = Dict[str, Dict[str, int]]
+
+
+async def fetch_event_tallies(db: AsyncSession, event_id: int, since: Optional[int] = None) -> EmoteCounts:
+    """Counts per emote, or only the emotes changed after version ``since``."""
+    query = select(EventEmoteTally).where(EventEmoteTally.voting_event_id == event_id)
+    if since is not None:
+        query = query.where(EventEmoteTally.version > since)
+    result = await db.execute(query)
+    return {
+        tally.emote_id: {
+            'keep': tally.keep_count,
+            'remove': tally.remove_count,
+            'neutral': tally.neutral_count
+        }
+        for tally in result.scalars().all()
+    }
+
+
+async def fetch_event_tally_snapshot(db: AsyncSession, event_id: int, since: Optional[int] = None) -> Tuple[Optional[int], EmoteCounts]:
+    """(tally_version, counts) for an event; version is None if the event doesn't exist."""
+    # Read the version first: rows changed after it are re-sent next time,
+    # which is harmless, whereas reading it last could skip a change
+    result = await db.execute(select(VotingEvent.tally_version).where(VotingEvent.id == event_id))
+    version = result.scalar_one_or_none()
+    if version is None:
+        return None, {}
+    return version, await fetch_event_tallies(db, event_id, since)
+
+
+class TallySubscription:
+    def __init__(self, event_id: int):
+        self.event_id = event_id
+        # Latest counts per emote not yet sent. Slow clients just get a bigger
+        # merged update instead of a growing backlog.
+        self._pending: EmoteCounts = {}
+        self._ready = asyncio.Event()
+
+    def push(self, counts: EmoteCounts):
+        self._pending.update(counts)
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Optional[EmoteCounts]:
+        """Wait for the next coalesced update, or return None on timeout."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        counts, self._pending = self._pending, {}
+        return counts
+
+
+class _EventChannel:
+    def __init__(self, event_id: int):
+        self.event_id = event_id
+        self.subscribers: Set[TallySubscription] = set()
+        self.snapshot: Optional[EmoteCounts] = None
+        self.version: Optional[int] = None
+        self.dirty = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class TallyHub:
+    def __init__(self):
+        self._channels: Dict[int, _EventChannel] = {}
+
+    async def subscribe(self, event_id: int) -> TallySubscription:
+        channel = self._channels.get(event_id)
+        if channel is None:
+            channel = _EventChannel(event_id)
+            self._channels[event_id] = channel
+            channel.task = asyncio.create_task(self._publish(channel))
+
+        subscription = TallySubscription(event_id)
+        # Register first so the channel isn't torn down while we load
+        channel.subscribers.add(subscription)
+        if channel.snapshot is None:
+            try:
+                async with AsyncSessionLocal() as db:
+                    channel.version, channel.snapshot = await fetch_event_tally_snapshot(db, event_id)
+            except Exception:
+                self.unsubscribe(subscription)
+                raise
+        # New subscribers start from the full snapshot, then receive deltas
+        subscription.push(dict(channel.snapshot))
+        return subscription
+
+    def unsubscribe(self, subscription: TallySubscription):
+        channel = self._channels.get(subscription.event_id)
+        if channel is None:
+            return
+        channel.subscribers.discard(subscription)
+        if not channel.subscribers:
+            channel.task.cancel()
+            del self._channels[subscription.event_id]
+
+    def notify(self, event_id: int):
+        """Mark an event's tallies as changed. No-op if nobody is watching it."""
+        channel = self._channels.get(event_id)
+        if channel is not None:
+            channel.dirty.set()
+
+    async def _publish(self, channel: _EventChannel):
+        interval = 1 / TALLY_STREAM_MAX_UPDATES_PER_SECOND
+        while True:
+            await channel.dirty.wait()
+            channel.dirty.clear()
+            try:
+                async with AsyncSessionLocal() as db:
+                    version, counts = await fetch_event_tally_snapshot(db, channel.event_id, channel.version)
+            except Exception as e:
+                print(f"[TALLY STREAM] Failed to read tallies for event {channel.event_id}: {str(e)}")
+                channel.dirty.set()
+                await asyncio.sleep(interval)
+                continue
+
+            previous = channel.snapshot or {}
+            changed = {emote_id: c for emote_id, c in counts.items() if previous.get(emote_id) != c}
+            channel.snapshot = {**previous, **counts}
+            channel.version = version
+            if changed:
+                for subscription in list(channel.subscribers):
+                    subscription.push(changed)
+
+            # Anything that changes during this sleep is folded into the next read
+            await asyncio.sleep(interval)
+
+
+tally_hub = TallyHub()
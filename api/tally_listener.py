@@ -0,0 +1,83 @@
+import asyncio
+import json
+from typing import Optional
+import asyncpg
+from database import DATABASE_URL, TALLY_NOTIFY_ENABLED
+from api.tally_hub import tally_hub
+from api.tally_cache import tally_cache
+
+# Cross-worker tally fan-out over Postgres LISTEN/NOTIFY.
+# The statement-level version bump triggers on individual_votes NOTIFY
+# {"e": event_id, "v": tally_version} as part of the vote write itself
+# (delivered only on commit). Every worker keeps one dedicated asyncpg
+# connection LISTENing on the channel and, for each event, wakes its local
+# tally hub and drops its cached /tallies. Enable this when running more than
+# one uvicorn worker; a single worker doesn't need it. With it off the app's
+# sessions don't set app.tally_notify and the triggers skip the NOTIFY.
+TALLY_NOTIFY_CHANNEL = 'vote_tallies'  # also named in the trigger functions
+TALLY_LISTEN_RECONNECT_SECONDS = 5
+
+
+def _on_notification(connection, pid, channel, payload):
+    try:
+        event_id = int(json.loads(payload)["e"])
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"[TALLY LISTEN] Ignoring malformed payload: {str(e)}")
+        return
+    tally_cache.invalidate(event_id)
+    tally_hub.notify(event_id)
+
+
+class TallyListener:
+    def __init__(self, dsn: str):
+        self._dsn = dsn
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self._dsn)
+                await connection.add_listener(TALLY_NOTIFY_CHANNEL, _on_notification)
+                print(f"[TALLY LISTEN] Listening on '{TALLY_NOTIFY_CHANNEL}'")
+                while not connection.is_closed():
+                    await asyncio.sleep(TALLY_LISTEN_RECONNECT_SECONDS)
+                print("[TALLY LISTEN] Connection closed, reconnecting...")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[TALLY LISTEN] Listener error, reconnecting in {TALLY_LISTEN_RECONNECT_SECONDS}s: {str(e)}")
+                await asyncio.sleep(TALLY_LISTEN_RECONNECT_SECONDS)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+tally_listener: Optional[TallyListener] = None
+
+
+def start_tally_listener():
+    global tally_listener
+    if not TALLY_NOTIFY_ENABLED:
+        return
+    tally_listener = TallyListener(DATABASE_URL)
+    tally_listener.start()
+
+
+async def stop_tally_listener():
+    global tally_listener
+    if tally_listener is None:
+        return
+    await tally_listener.stop()
+    tally_listener = None
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy import select, or_, exists
+from database import AsyncSessionLocal
+from models import ChannelTokens, User, VotingEvent
+from api.twitch_api import renew_access_token
+
+# Refreshes Twitch tokens shortly before ChannelTokens.expires_at so access
+# checks almost never pay for a 401 and a refresh round trip. Only tokens that
+# are likely to be used are renewed: creators of live events (their token
+# answers every subscriber check) and users who logged in recently.
+TOKEN_RENEW_BEFORE_SECONDS = float(os.getenv('TOKEN_RENEW_BEFORE_SECONDS', '600'))
+TOKEN_RENEW_INTERVAL_SECONDS = float(os.getenv('TOKEN_RENEW_INTERVAL_SECONDS', '60'))
+TOKEN_RENEW_ACTIVE_HOURS = float(os.getenv('TOKEN_RENEW_ACTIVE_HOURS', '24'))
+TOKEN_RENEW_BATCH_SIZE = int(os.getenv('TOKEN_RENEW_BATCH_SIZE', '50'))
+# Tokens that failed to renew (usually a revoked refresh token) are left to the
+# 401 path for this long instead of being retried every pass
+TOKEN_RENEW_FAILURE_BACKOFF_SECONDS = float(os.getenv('TOKEN_RENEW_FAILURE_BACKOFF_SECONDS', '3600'))
+
+
+class TokenRenewer:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._failed: Dict[int, float] = {}  # users.id -> monotonic time to retry after
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def renew_expiring_tokens(self) -> int:
+        now = datetime.now(timezone.utc)
+        self._failed = {user_id: retry_at for user_id, retry_at in self._failed.items() if retry_at > time.monotonic()}
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(ChannelTokens.user_id)
+                .join(User, User.id == ChannelTokens.user_id)
+                .where(
+                    ChannelTokens.refresh_token.isnot(None),
+                    ChannelTokens.expires_at < now + timedelta(seconds=TOKEN_RENEW_BEFORE_SECONDS),
+                    ChannelTokens.user_id.notin_(list(self._failed)),
+                    or_(
+                        User.last_login > now - timedelta(hours=TOKEN_RENEW_ACTIVE_HOURS),
+                        exists().where(
+                            VotingEvent.creator_id == User.id,
+                            VotingEvent.is_active.is_(True)
+                        )
+                    )
+                )
+                .order_by(ChannelTokens.expires_at)
+                .limit(TOKEN_RENEW_BATCH_SIZE)
+            )
+            user_ids = result.scalars().all()
+
+        renewed = 0
+        for user_id in user_ids:
+            refresh_result = await renew_access_token(user_id, TOKEN_RENEW_BEFORE_SECONDS)
+            if refresh_result.get("Success"):
+                renewed += 1
+            elif refresh_result.get("Skipped"):
+                # Another worker has it
+                continue
+            else:
+                self._failed[user_id] = time.monotonic() + TOKEN_RENEW_FAILURE_BACKOFF_SECONDS
+                print(f"[TOKEN RENEW] Could not renew token for user {user_id}: {refresh_result.get('message')}")
+        if user_ids:
+            print(f"[TOKEN RENEW] Renewed {renewed}/{len(user_ids)} expiring tokens")
+        return renewed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.renew_expiring_tokens()
+            except Exception as e:
+                print(f"[TOKEN RENEW] Renewal pass failed: {str(e)}")
+            await asyncio.sleep(TOKEN_RENEW_INTERVAL_SECONDS)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+token_renewer: Optional[TokenRenewer] = None
+
+
+def start_token_renewer():
+    global token_renewer
+    token_renewer = TokenRenewer()
+    token_renewer.start()
+
+
+async def stop_token_renewer():
+    global token_renewer
+    if token_renewer is None:
+        return
+    await token_renewer.stop()
+    token_renewer = None
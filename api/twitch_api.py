@@ -3,97 +3,146 @@ from sqlalchemy import select
 from models import ChannelTokens, User
 import os
 import httpx
-from typing import Optional
+from api.http_client import get_http_client
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
+import time
+from database import AsyncSessionLocal
+from api.follow_cache import (
+    FollowCache, FollowedChannels,
+    FOLLOW_CACHE_TTL_SECONDS, FOLLOW_CACHE_STALE_SECONDS, FOLLOW_CACHE_MAX_USERS
+)
+from api.subscription_cache import (
+    BroadcasterToken, MISSING, broadcaster_token_cache, subscription_cache, cache_subscription,
+    BROADCASTER_TOKEN_CACHE_TTL_SECONDS
+)
+from api.subscription_batcher import SubscriptionBatcher, SUB_BATCH_WINDOW_MS, SUB_BATCH_MAX_USERS
+from api.helix_scheduler import helix_get, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from api.single_flight import SingleFlight
 
-async def check_user_follows_channel(user: User, channel_id: str, db: AsyncSession, retry_count: int = 0) -> bool:
+# How long a finished refresh is reused by callers that hit a 401 with the old token
+TOKEN_REFRESH_REUSE_SECONDS = float(os.getenv('TOKEN_REFRESH_REUSE_SECONDS', '10'))
+
+token_refreshes = SingleFlight()
+# users.id -> (finished, result) of refreshes finished in the last TOKEN_REFRESH_REUSE_SECONDS
+recent_token_refreshes: Dict[int, Tuple[float, dict]] = {}
+
+async def fetch_followed_channel_ids(user: User, db: AsyncSession, priority: int = PRIORITY_INTERACTIVE) -> Optional[FollowedChannels]:
     """
-    Check if a user follows a specific channel using Twitch Helix API
+    Page through every channel the user follows on Twitch (Helix /channels/followed).
+    Returns None if the user has no token; raises on Twitch/network errors.
     """
-    user_id = user.twitch_user_id
-    # Get access token from ChannelTokens (stored for this user)
     token_result = await db.execute(
         select(ChannelTokens).where(ChannelTokens.user_id == user.id)
     )
     channel_token = token_result.scalar_one_or_none()
     if not channel_token or not channel_token.access_token:
-        print(f"DEBUG [Follow Check - retry {retry_count}]: No access token found for user {user.twitch_username}")
-        return False
+        print(f"[FOLLOWS] No access token found for user {user.twitch_username}")
+        return None
     access_token = channel_token.access_token
-    print(f"DEBUG [Follow Check - retry {retry_count}]: Using token ending in ...{access_token[-10:] if access_token else 'None'}")
-    try:
-        client_id = os.getenv("TWITCH_CLIENT_ID")
+    client_id = os.getenv("TWITCH_CLIENT_ID")
 
-        async with httpx.AsyncClient() as client:
-            # Fetch all pages to search for the broadcaster
-            all_followed_channels = []
-            cursor = None
-            
-            while True:
-                url = f"https://api.twitch.tv/helix/channels/followed?user_id={user_id}&first=100"
-                if cursor:
-                    url += f"&after={cursor}"
-                    
-                following_response = await client.get(url,
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Client-Id": client_id
-                })
-                
-                if following_response.status_code == 401:
-                    # Token expired
-                    if retry_count >= 1:
-                        print("Token refresh already attempted, failing")
-                        return False
-                    
-                    # Try to refresh
-                    print("Token expired, attempting refresh...")
-                    refresh_result = await refresh_access_token(user, db)
-                    
-                    if refresh_result.get("Success"):
-                        # Get the refreshed token from ChannelTokens
-                        token_result = await db.execute(
-                            select(ChannelTokens).where(ChannelTokens.user_id == user.id)
-                        )
-                        channel_token = token_result.scalar_one_or_none()
-                        if not channel_token or not channel_token.access_token:
-                            print("Token refresh succeeded but no token found in ChannelTokens")
-                            return False
-                        user_id = user.twitch_user_id
-                        access_token = channel_token.access_token
-                        print(f"DEBUG [Follow Check - retry {retry_count}]: Using token ending in ...{access_token[-10:] if access_token else 'None'}")
-                        print("Token refreshed, retrying follow check")
-                        return await check_user_follows_channel(user, channel_id, db, retry_count + 1)
-                    else:
-                        print("Token refresh failed")
-                        return False
-                
-                following_data = following_response.json()
-                
-                if 'error' in following_data:
-                    return False
-                
-                page_data = following_data.get('data', [])
-                all_followed_channels.extend(page_data)
-                
-                # Check if we found the broadcaster on this page
-                result = any(ch.get('broadcaster_id') == channel_id for ch in page_data)
-                if result:
-                    return True
-                
-                # Check if there are more pages
-                cursor = following_data.get('pagination', {}).get('cursor')
-                if not cursor:
-                    break
-            
-            # Check the complete list
-            result = any(ch.get('broadcaster_id') == channel_id for ch in all_followed_channels)
-            return result
+    followed = set()
+    cursor = None
+    refreshed = False
 
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 410:
-            return False
-        print(f"HTTP error: {e.response.status_code} - {e.response.text}")
-        return False
+    while True:
+        url = f"https://api.twitch.tv/helix/channels/followed?user_id={user.twitch_user_id}&first=100"
+        if cursor:
+            url += f"&after={cursor}"
+
+        following_response = await helix_get(url, priority,
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Client-Id": client_id
+        })
+
+        if following_response.status_code == 401 and not refreshed:
+            # Token expired: refresh once and carry on from the same page
+            print("[FOLLOWS] Token expired, attempting refresh...")
+            refreshed = True
+            refresh_result = await refresh_access_token(user.id)
+            if not refresh_result.get("Success"):
+                following_response.raise_for_status()
+            access_token = refresh_result["access_token"]
+            continue
+
+        following_response.raise_for_status()
+        following_data = following_response.json()
+
+        followed.update(ch.get('broadcaster_id') for ch in following_data.get('data', []))
+
+        cursor = following_data.get('pagination', {}).get('cursor')
+        if not cursor:
+            break
+
+    print(f"[FOLLOWS] Fetched {len(followed)} followed channels for {user.twitch_username}")
+    return frozenset(followed)
+
+
+async def load_followed_channel_ids(user_id: int, background: bool) -> Optional[FollowedChannels]:
+    # Runs outside any request (background refreshes), so it uses its own session
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if not user:
+            return None
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_INTERACTIVE
+        return await fetch_followed_channel_ids(user, db, priority)
+
+
+follow_cache = FollowCache(
+    load_followed_channel_ids, FOLLOW_CACHE_TTL_SECONDS, FOLLOW_CACHE_STALE_SECONDS, FOLLOW_CACHE_MAX_USERS
+)
+
+
+async def fetch_user_follows_channel(user: User, channel_id: str, db: AsyncSession) -> Optional[bool]:
+    """
+    Ask Helix about one follow relationship (broadcaster_id filter): a single
+    request however many channels the user follows. Returns None if the user
+    has no token; raises on Twitch/network errors.
+    """
+    token_result = await db.execute(
+        select(ChannelTokens).where(ChannelTokens.user_id == user.id)
+    )
+    channel_token = token_result.scalar_one_or_none()
+    if not channel_token or not channel_token.access_token:
+        print(f"[FOLLOWS] No access token found for user {user.twitch_username}")
+        return None
+    access_token = channel_token.access_token
+
+    for attempt in range(2):
+        following_response = await helix_get(
+            "https://api.twitch.tv/helix/channels/followed",
+            params={"user_id": user.twitch_user_id, "broadcaster_id": channel_id},
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Client-Id": os.getenv("TWITCH_CLIENT_ID")
+            }
+        )
+        if following_response.status_code != 401 or attempt:
+            break
+        print("[FOLLOWS] Token expired, attempting refresh...")
+        refresh_result = await refresh_access_token(user.id)
+        if not refresh_result.get("Success"):
+            break
+        access_token = refresh_result["access_token"]
+
+    following_response.raise_for_status()
+    return len(following_response.json().get('data', [])) > 0
+
+
+async def check_user_follows_channel(user: User, channel_id: str, db: AsyncSession) -> bool:
+    """
+    Check if a user follows a specific channel. A fresh followed-set cache can
+    only say yes (the user may have followed since it was fetched); anything
+    else is one targeted Helix request.
+    """
+    followed = follow_cache.peek(user.id)
+    if followed is not None and channel_id in followed:
+        return True
+    try:
+        return bool(await fetch_user_follows_channel(user, channel_id, db))
     except httpx.HTTPStatusError as e:
         print(f"HTTP error: {e.response.status_code} - {e.response.text}")
         return False
@@ -104,142 +153,237 @@ async def check_user_follows_channel(user: User, channel_id: str, db: AsyncSessi
         print(f"Unexpected error: {e}")
         return False
     
-async def check_user_subscribed_to_channel(user: User, broadcaster_id: str, db: AsyncSession, retry_count: int = 0) -> bool:
-    # First, convert broadcaster's twitch_user_id to their internal user_id
-    user_id = user.twitch_user_id
-    try:
-        # Look up the broadcaster's internal user_id from their twitch_user_id
-        user_result = await db.execute(
-            select(User.id).where(User.twitch_user_id == broadcaster_id)
-        )
-        user_row = user_result.first()
-        if not user_row:
-            return False
-        creator_user_id = user_row[0]
-        
-        token_result = await db.execute(
-            select(ChannelTokens).where(ChannelTokens.user_id == creator_user_id)
+async def get_broadcaster_tokens(db: AsyncSession, broadcaster_ids: Iterable[str]) -> Dict[str, Optional[BroadcasterToken]]:
+    """Tokens for the given broadcaster twitch_user_ids: cached, then one query for the rest."""
+    tokens = {}
+    missing = []
+    for broadcaster_id in broadcaster_ids:
+        token = broadcaster_token_cache.get(broadcaster_id)
+        if token is MISSING:
+            missing.append(broadcaster_id)
+        else:
+            tokens[broadcaster_id] = token
+
+    if missing:
+        result = await db.execute(
+            select(User.twitch_user_id, User.id, ChannelTokens.access_token)
+            .join(ChannelTokens, ChannelTokens.user_id == User.id)
+            .where(User.twitch_user_id.in_(missing), ChannelTokens.access_token.isnot(None))
         )
-        token_row = token_result.first()
-        if not token_row:
-            return False
-        token = token_row[0]  # Extract the ChannelTokens object
-        print(f"DEBUG [Sub Check - retry {retry_count}]: Using broadcaster token ending in ...{token.access_token[-10:] if token.access_token else 'None'}")
-        if not token:
-            return False
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.twitch.tv/helix/subscriptions?broadcaster_id={broadcaster_id}&user_id={user_id}",
+        found = {row[0]: BroadcasterToken(row[1], row[2]) for row in result.all()}
+        for broadcaster_id in missing:
+            tokens[broadcaster_id] = found.get(broadcaster_id)
+            broadcaster_token_cache.set(broadcaster_id, tokens[broadcaster_id], BROADCASTER_TOKEN_CACHE_TTL_SECONDS)
+    return tokens
+
+
+async def refresh_broadcaster_token(broadcaster_id: str, token: BroadcasterToken) -> Optional[BroadcasterToken]:
+    refresh_result = await refresh_access_token(token.user_id)
+    if not refresh_result.get("Success"):
+        print("Broadcaster token refresh failed")
+        return None
+    return BroadcasterToken(token.user_id, refresh_result["access_token"])
+
+
+async def fetch_subscriptions(broadcaster_id: str, viewer_ids: List[str], token: BroadcasterToken) -> Optional[FrozenSet[str]]:
+    """
+    Ask Helix which of viewer_ids (up to 100) subscribe to broadcaster_id,
+    using the broadcaster's token. None means the answer is unknown (don't cache it).
+    """
+    try:
+        for attempt in range(2):
+            response = await helix_get(
+                "https://api.twitch.tv/helix/subscriptions",
+                params=[("broadcaster_id", broadcaster_id)] + [("user_id", viewer_id) for viewer_id in viewer_ids],
                 headers={
                     "Authorization": f"Bearer {token.access_token}",
                     "Client-Id": os.getenv("TWITCH_CLIENT_ID")
                 }
             )
-            if response.status_code == 401:
-                # Broadcaster's token expired
-                if retry_count >= 1:
-                    print("Token refresh already attempted, failing")
-                    return False
-                
-                # Need to get the broadcaster's User object to refresh their token
-                print("Broadcaster token expired, attempting refresh...")
-                broadcaster_result = await db.execute(
-                    select(User).where(User.twitch_user_id == broadcaster_id)
-                )
-                broadcaster_user = broadcaster_result.scalar_one_or_none()
-                
-                if not broadcaster_user:
-                    return False
-                
-                refresh_result = await refresh_access_token(broadcaster_user, db)
-                
-                if refresh_result.get("Success"):
-                    print("Broadcaster token refreshed, retrying subscription check")
-                    return await check_user_subscribed_to_channel(user, broadcaster_id, db, retry_count + 1)
-                else:
-                    print("Broadcaster token refresh failed")
-                    return False
-
-            # Check status code FIRST
-            elif response.status_code == 200:
-                data = response.json()
-                return len(data.get('data', [])) > 0
-
-            elif response.status_code == 403:
-                # Don't have permission
-                print(f"Forbidden: Missing required scope")
-                return False
-            
-            else:
-                # Other errors
-                print(f"Unexpected status: {response.status_code}")
-                return False
-    
+            if response.status_code != 401:
+                break
+            # Broadcaster's token expired
+            if attempt:
+                print("Token refresh already attempted, failing")
+                return None
+            print("Broadcaster token expired, attempting refresh...")
+            token = await refresh_broadcaster_token(broadcaster_id, token)
+            if token is None:
+                return None
+
+        if response.status_code == 200:
+            return frozenset(sub.get('user_id') for sub in response.json().get('data', []))
+        elif response.status_code == 403:
+            # Missing channel:read:subscriptions; won't change until they log in again
+            print(f"Forbidden: Missing required scope")
+            return frozenset()
+        else:
+            print(f"Unexpected status: {response.status_code}")
+            return None
+
     except httpx.RequestError as e:
         # Network errors only
         print(f"Request error: {e}")
-        return False
+        return None
     except Exception as e:
         print(f"Unexpected error: {e}")
-        return False
+        return None
+
+
+subscription_batcher = SubscriptionBatcher(fetch_subscriptions, SUB_BATCH_WINDOW_MS, SUB_BATCH_MAX_USERS)
 
-async def refresh_access_token(user: User, db: AsyncSession):
+
+async def check_user_subscriptions(user: User, broadcaster_ids: Iterable[str], db: AsyncSession) -> Dict[str, bool]:
+    """
+    Subscription status of user for each broadcaster twitch_user_id. Cached
+    answers are used first; the rest are checked against Helix in parallel,
+    batched with other viewers' checks on the same broadcaster.
+    Only the token lookup touches db, so it is safe on a request session.
+    """
+    viewer_id = user.twitch_user_id
+    results = {}
+    pending = []
+    for broadcaster_id in broadcaster_ids:
+        cached = subscription_cache.get((broadcaster_id, viewer_id))
+        if cached is MISSING:
+            pending.append(broadcaster_id)
+        else:
+            results[broadcaster_id] = cached
+    if not pending:
+        return results
+
+    tokens = await get_broadcaster_tokens(db, pending)
+    # Broadcasters without a token can't be checked
+    results.update((broadcaster_id, False) for broadcaster_id in pending)
+    to_check = [broadcaster_id for broadcaster_id in pending if tokens[broadcaster_id] is not None]
+    checked = await asyncio.gather(*[
+        subscription_batcher.check(broadcaster_id, viewer_id, tokens[broadcaster_id]) for broadcaster_id in to_check
+    ])
+    for broadcaster_id, subscribed in zip(to_check, checked):
+        if subscribed is not None:
+            cache_subscription(broadcaster_id, viewer_id, subscribed)
+            results[broadcaster_id] = subscribed
+    return results
+
+
+async def check_user_subscribed_to_channel(user: User, broadcaster_id: str, db: AsyncSession) -> bool:
+    results = await check_user_subscriptions(user, [broadcaster_id], db)
+    return results[broadcaster_id]
+
+async def refresh_access_token(user_id: int) -> dict:
+    """
+    Refresh a user's Twitch token. Concurrent callers for the same user share
+    one refresh, and callers that got a 401 just after it finished reuse its
+    result, so a rotated refresh token is only ever spent once.
+    """
+    recent = recent_token_refreshes.get(user_id)
+    if recent is not None and time.monotonic() - recent[0] < TOKEN_REFRESH_REUSE_SECONDS:
+        return recent[1]
+
+    async def refresh() -> dict:
+        result = await _refresh_access_token(user_id)
+        now = time.monotonic()
+        expired = [key for key, (finished, _) in recent_token_refreshes.items() if now - finished >= TOKEN_REFRESH_REUSE_SECONDS]
+        for key in expired:
+            del recent_token_refreshes[key]
+        recent_token_refreshes[user_id] = (now, result)
+        return result
+
+    return await token_refreshes.do(user_id, refresh)
+
+
+async def renew_access_token(user_id: int, renew_before: float) -> dict:
+    """
+    Background renewal of a token expiring within renew_before seconds. Every
+    worker runs a renewer, so the token row is claimed with SKIP LOCKED and
+    expires_at re-checked under the lock; a token another worker is renewing,
+    or has just renewed, is left alone ("Skipped").
+    """
+    return await _refresh_access_token(user_id, renew_before)
+
+
+async def _refresh_access_token(user_id: int, renew_before: Optional[float] = None) -> dict:
+    # Shared by several callers, so it runs on its own session
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if not user:
+            return {"Success": False, "message": "User not found"}
+        return await _refresh_user_token(user, db, renew_before)
+
+
+async def _refresh_user_token(user: User, db: AsyncSession, renew_before: Optional[float] = None) -> dict:
     try:
-        # Get refresh token from ChannelTokens
-        token_result = await db.execute(select(ChannelTokens).where(ChannelTokens.user_id == user.id))
+        # Get refresh token from ChannelTokens. The row stays locked until the
+        # commit, so workers refreshing the same user take turns and each one
+        # spends the refresh token the previous one stored.
+        token_query = select(ChannelTokens).where(ChannelTokens.user_id == user.id)
+        if renew_before is None:
+            token_query = token_query.with_for_update()
+        else:
+            token_query = token_query.with_for_update(skip_locked=True)
+        token_result = await db.execute(token_query)
         token_row = token_result.first()
         if not token_row:
+            if renew_before is not None:
+                return {"Success": False, "Skipped": True, "message": "Token is being refreshed elsewhere"}
             return {"Success": False, "message": "No token found in ChannelTokens"}
         user_token = token_row[0]
+        if renew_before is not None and user_token.expires_at is not None and \
+                user_token.expires_at > datetime.now(timezone.utc) + timedelta(seconds=renew_before):
+            return {"Success": False, "Skipped": True, "message": "Token was already renewed"}
         refresh_token = user_token.refresh_token or user.refresh_token  # Fallback to User model if needed
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://id.twitch.tv/oauth2/token",
-                data={
-                    "client_id": os.getenv("TWITCH_CLIENT_ID"),
-                    "client_secret": os.getenv("TWITCH_CLIENT_SECRET"),
-                    "grant_type": "refresh_token",
-                    "refresh_token": refresh_token
-                }
-            )
+        client = get_http_client()
+        response = await client.post(
+            "https://id.twitch.tv/oauth2/token",
+            data={
+                "client_id": os.getenv("TWITCH_CLIENT_ID"),
+                "client_secret": os.getenv("TWITCH_CLIENT_SECRET"),
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token
+            }
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'access_token' not in data:
-                    print(f"ERROR: No access_token in response: {data}")
-                    return {"Success": False, "message": "Invalid response from Twitch"}
-
-                # Update tokens (user_token already fetched earlier)
-                if user_token:
-                    user_token.access_token = data['access_token']
-                    user.access_token = data['access_token']  # Also update User model for backward compatibility
-                    print(f"DEBUG [Refresh]: Updated ChannelTokens.access_token to ...{data['access_token'][-10:]}")
-
-                    # Check if Twitch sent a new refresh token
-                    if 'refresh_token' in data:
-                        user_token.refresh_token = data['refresh_token']
-                        user.refresh_token = data['refresh_token']  # Also update User model for backward compatibility
-
-                    await db.commit()
-                else:
-                    return {"Success": False, "message": "Token record not found"}
-
-                return {"Success": True, "access_token": data['access_token']}
+        if response.status_code == 200:
+            data = response.json()
             
-            elif response.status_code == 400:
-                print(f"Bad request: Invalid refresh token")
-                return {"Success": False, "message": "Refresh token invalid. Please log in again."}
-            
-            elif response.status_code == 401:
-                print(f"Unauthorized: Check client_id/client_secret")
-                return {"Success": False, "message": "Authentication configuration error"}
+            if 'access_token' not in data:
+                print(f"ERROR: No access_token in response: {data}")
+                return {"Success": False, "message": "Invalid response from Twitch"}
+
+            # Update tokens (user_token already fetched earlier)
+            if user_token:
+                user_token.access_token = data['access_token']
+                user.access_token = data['access_token']  # Also update User model for backward compatibility
+                print(f"DEBUG [Refresh]: Updated ChannelTokens.access_token to ...{data['access_token'][-10:]}")
+
+                # Check if Twitch sent a new refresh token
+                if 'refresh_token' in data:
+                    user_token.refresh_token = data['refresh_token']
+                    user.refresh_token = data['refresh_token']  # Also update User model for backward compatibility
 
+                expires_at = datetime.now(timezone.utc) + timedelta(seconds=data.get('expires_in', 3600))
+                user_token.expires_at = expires_at
+                user.token_expires_at = expires_at
+
+                await db.commit()
+                broadcaster_token_cache.invalidate(user.twitch_user_id)
             else:
-                print(f"Unexpected status code: {response.status_code}, body: {response.text}")
-                return {"Success": False, "message": "Token refresh failed"}
+                return {"Success": False, "message": "Token record not found"}
+
+            return {"Success": True, "access_token": data['access_token']}
+        
+        elif response.status_code == 400:
+            print(f"Bad request: Invalid refresh token")
+            return {"Success": False, "message": "Refresh token invalid. Please log in again."}
+        
+        elif response.status_code == 401:
+            print(f"Unauthorized: Check client_id/client_secret")
+            return {"Success": False, "message": "Authentication configuration error"}
+
+        else:
+            print(f"Unexpected status code: {response.status_code}, body: {response.text}")
+            return {"Success": False, "message": "Token refresh failed"}
 
     except httpx.RequestError as e:
         print(f"Network error during token refresh: {e}")
@@ -2,8 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database import get_database
-from models import User, ChannelTokens
+from models import User
 import httpx
+from api.seventv_api import post_seventv_gql
+from api.twitch_api import follow_cache
 import pprint
 import os
 
@@ -23,19 +25,18 @@ async def get_user(username: str) -> dict:
         }}
     }}
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://7tv.io/v3/gql", json={"query": user_query})
-        data = response.json().get('data')
-        pprint.pprint(data)
-        correct_user = [user for user in data['users'] if user['username'] == username and any(conn['platform'] == 'TWITCH' for conn in user['connections'])]
-        if response.status_code !=200:
-            raise HTTPException(status_code=500, detail='7TV API error')
-        elif len(correct_user) == 1:
-            return {'message': f'{correct_user[0]['username']} has been found', 'id': correct_user[0]['id']}
-        elif len(correct_user) == 0:
-            raise HTTPException(status_code=404, detail='User not found')
-        else:
-            raise HTTPException(status_code=404, detail='Multiple users found, unknown error')
+    response = await post_seventv_gql(user_query)
+    data = response.json().get('data')
+    pprint.pprint(data)
+    correct_user = [user for user in data['users'] if user['username'] == username and any(conn['platform'] == 'TWITCH' for conn in user['connections'])]
+    if response.status_code !=200:
+        raise HTTPException(status_code=500, detail='7TV API error')
+    elif len(correct_user) == 1:
+        return {'message': f'{correct_user[0]['username']} has been found', 'id': correct_user[0]['id']}
+    elif len(correct_user) == 0:
+        raise HTTPException(status_code=404, detail='User not found')
+    else:
+        raise HTTPException(status_code=404, detail='Multiple users found, unknown error')
 
 
 @router.get('/user/following')
@@ -57,62 +58,20 @@ async def get_user_following(request: Request, db: AsyncSession = Depends(get_da
     if not user:
         raise HTTPException(status_code=404, detail="User not found in database")
     
-    # Fetch followed channels from Twitch
-    user_id = user.twitch_user_id
-    # Get access token from ChannelTokens (stored for this user)
-    token_result = await db.execute(
-        select(ChannelTokens).where(ChannelTokens.user_id == user.id)
-    )
-    channel_token = token_result.scalar_one_or_none()
-    if not channel_token or not channel_token.access_token:
-        raise HTTPException(status_code=401, detail="No access token found. Please log in again.")
-    access_token = channel_token.access_token
-    client_id = os.getenv("TWITCH_CLIENT_ID")
-    
+    # Fetch followed channels from Twitch (cached per user)
     try:
-        async with httpx.AsyncClient() as client:
-            all_followed_channels = []
-            cursor = None
-            
-            # Paginate through all followed channels
-            while True:
-                url = f"https://api.twitch.tv/helix/channels/followed?user_id={user_id}&first=100"
-                if cursor:
-                    url += f"&after={cursor}"
-                
-                following_response = await client.get(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "Client-Id": client_id
-                    }
-                )
-                
-                if following_response.status_code != 200:
-                    raise HTTPException(
-                        status_code=following_response.status_code,
-                        detail=f"Twitch API error: {following_response.text}"
-                    )
-                
-                following_data = following_response.json()
-                
-                if 'error' in following_data:
-                    raise HTTPException(status_code=400, detail="Error fetching followed channels")
-                
-                page_data = following_data.get('data', [])
-                all_followed_channels.extend(page_data)
-                
-                # Check if there are more pages
-                cursor = following_data.get('pagination', {}).get('cursor')
-                if not cursor:
-                    break
-            
-            # Extract broadcaster IDs
-            channel_ids = [channel.get('broadcaster_id') for channel in all_followed_channels]
-            
-            return {"channel_ids": channel_ids}
-    
+        followed = await follow_cache.get(user.id)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Twitch API error: {e.response.text}"
+        )
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Request error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    if followed is None:
+        raise HTTPException(status_code=401, detail="No access token found. Please log in again.")
+
+    return {"channel_ids": list(followed)}
\ No newline at end of file
@@ -0,0 +1,179 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
+
+# Write-behind buffering for /votes/submit and /votes/submit-batch.
+# Off by default; when enabled, votes are coalesced in memory (last writer wins
+# per event/voter/emote) and written with one multi-row upsert per flush.
+VOTE_BUFFER_ENABLED = os.getenv('VOTE_BUFFER_ENABLED', 'false').lower() == 'true'
+VOTE_BUFFER_FLUSH_MS = int(os.getenv('VOTE_BUFFER_FLUSH_MS', '250'))
+VOTE_BUFFER_FLUSH_SIZE = int(os.getenv('VOTE_BUFFER_FLUSH_SIZE', '500'))
+VOTE_BUFFER_MAX_PENDING = int(os.getenv('VOTE_BUFFER_MAX_PENDING', '20000'))
+VOTE_BUFFER_ENQUEUE_TIMEOUT = float(os.getenv('VOTE_BUFFER_ENQUEUE_TIMEOUT', '2.0'))
+
+VoteKey = Tuple[int, int, str]  # (voting_event_id, voter_id, emote_id)
+FlushFn = Callable[[List[dict]], Awaitable[None]]
+
+
+# SQLSTATE classes caused by the data itself: 22 (data exception, e.g. a value
+# of the wrong type) and 23 (integrity constraint violation, e.g. a deleted event)
+ROW_ERROR_SQLSTATE_CLASSES = ('22', '23')
+
+
+def is_row_error(error: Exception) -> bool:
+    """Whether the statement failed because of the rows in it, so the batch can
+    be narrowed down to them. Anything else (lost connections, deadlocks,
+    timeouts, a read-only failover replica) fails the whole batch for a retry."""
+    if isinstance(error, (IntegrityError, DataError)):
+        return True
+    sqlstate = str(getattr(getattr(error, 'orig', None), 'sqlstate', None) or '')
+    return isinstance(error, DBAPIError) and sqlstate[:2] in ROW_ERROR_SQLSTATE_CLASSES
+
+
+class VoteBuffer:
+    def __init__(self, flush_fn: FlushFn, flush_interval_ms: int, flush_size: int, max_pending: int):
+        self._flush_fn = flush_fn
+        self._flush_interval = flush_interval_ms / 1000
+        self._flush_size = flush_size
+        self._max_pending = max_pending
+        self._pending: Dict[VoteKey, str] = {}
+        self._inflight: Dict[VoteKey, str] = {}
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def _size(self) -> int:
+        # In-flight rows still hold their slot until the flush commits
+        return len(self._pending) + len(self._inflight)
+
+    async def put(self, votes: List[Tuple[VoteKey, str]]) -> bool:
+        """Queue votes, waiting for space if the buffer is full.
+
+        Returns False when the buffer is closed or stays full for longer than
+        VOTE_BUFFER_ENQUEUE_TIMEOUT, so the caller can tell the client to retry.
+        """
+        if self._closed:
+            return False
+
+        def has_room():
+            new_keys = sum(1 for key, _ in votes if key not in self._pending)
+            return self._closed or self._size() + new_keys <= self._max_pending
+
+        async with self._space:
+            try:
+                await asyncio.wait_for(self._space.wait_for(has_room), timeout=VOTE_BUFFER_ENQUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"[VOTE BUFFER] Full ({self._size()} pending), rejecting {len(votes)} votes")
+                return False
+            if self._closed:
+                return False
+            for key, choice in votes:
+                self._pending[key] = choice
+
+        if len(self._pending) >= self._flush_size:
+            self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._pending:
+                if not await self._flush_once():
+                    break
+
+            if self._closed and not self._pending:
+                return
+
+    async def _flush_once(self) -> bool:
+        keys = list(self._pending)[:self._flush_size]
+        for key in keys:
+            self._inflight[key] = self._pending.pop(key)
+
+        rows = [
+            {'voting_event_id': event_id, 'voter_id': voter_id, 'emote_id': emote_id, 'vote_choice': choice}
+            for (event_id, voter_id, emote_id), choice in self._inflight.items()
+        ]
+
+        flush_start_time = datetime.now()
+        try:
+            dropped = await self._write(rows)
+            flushed = True
+            flush_duration = (datetime.now() - flush_start_time).total_seconds() * 1000
+            print(f"[VOTE BUFFER] Flushed {len(rows) - dropped} votes in {flush_duration:.2f}ms")
+        except Exception as e:
+            flushed = False
+            print(f"[VOTE BUFFER] Flush of {len(rows)} votes failed, will retry: {str(e)}")
+            # Put them back unless a newer vote for the same key arrived meanwhile
+            for key, choice in self._inflight.items():
+                self._pending.setdefault(key, choice)
+
+        self._inflight.clear()
+        async with self._space:
+            self._space.notify_all()
+
+        if not flushed and self._closed:
+            # Nothing left to retry against on shutdown; don't spin forever
+            print(f"[VOTE BUFFER] Dropping {len(self._pending)} votes that could not be flushed on shutdown")
+            self._pending.clear()
+        return flushed
+
+    async def _write(self, rows: List[dict]) -> int:
+        """Flush rows, splitting a batch Postgres rejects in half until the bad
+        rows are isolated. Those are logged and dropped rather than retried
+        forever with everything that shares their flush. Returns how many were
+        dropped; any other error propagates so the whole batch is retried."""
+        try:
+            await self._flush_fn(rows)
+            return 0
+        except Exception as e:
+            if not is_row_error(e):
+                raise
+            if len(rows) == 1:
+                print(f"[VOTE BUFFER] Dropping vote that cannot be written {rows[0]}: {str(e)}")
+                return 1
+        middle = len(rows) // 2
+        return await self._write(rows[:middle]) + await self._write(rows[middle:])
+
+    async def drain(self):
+        """Stop accepting votes and flush everything still pending."""
+        self._closed = True
+        async with self._space:
+            self._space.notify_all()
+        self._wakeup.set()
+        if self._task:
+            await self._task
+
+
+vote_buffer: Optional[VoteBuffer] = None
+
+
+def get_vote_buffer() -> Optional[VoteBuffer]:
+    return vote_buffer
+
+
+def start_vote_buffer(flush_fn: FlushFn):
+    global vote_buffer
+    if not VOTE_BUFFER_ENABLED:
+        return
+    vote_buffer = VoteBuffer(flush_fn, VOTE_BUFFER_FLUSH_MS, VOTE_BUFFER_FLUSH_SIZE, VOTE_BUFFER_MAX_PENDING)
+    vote_buffer.start()
+    print(f"[VOTE BUFFER] Enabled: flush every {VOTE_BUFFER_FLUSH_MS}ms or {VOTE_BUFFER_FLUSH_SIZE} votes, max {VOTE_BUFFER_MAX_PENDING} pending")
+
+
+async def stop_vote_buffer():
+    global vote_buffer
+    if vote_buffer is None:
+        return
+    await vote_buffer.drain()
+    vote_buffer = None
@@ -1,17 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
-from database import get_database
-from models import VotingEvent, User, IndividualVote, ChannelTokens
-from sqlalchemy import select, func, delete
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse, Response
+from database import get_database, AsyncSessionLocal
+from models import VotingEvent, User, IndividualVote, EventAudience, EventEmote
+from sqlalchemy import select, delete, exists, literal_column, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 from datetime import datetime, timedelta, timezone as dt_timezone
 from pydantic import BaseModel
-from typing import Optional, List
-from api.twitch_api import check_user_follows_channel, check_user_subscribed_to_channel
-import httpx
+from typing import Optional, List, Dict, Literal
+from api.twitch_api import check_user_follows_channel, check_user_subscribed_to_channel, check_user_subscriptions, follow_cache
+from api.vote_buffer import get_vote_buffer
+from api.tally_hub import tally_hub, fetch_event_tallies, TALLY_STREAM_KEEPALIVE_SECONDS
+from api.tally_cache import tally_cache, TALLY_CACHE_TTL_SECONDS
+from api.event_expiry import schedule_event_expiry
+from api.mods import is_moderator_of, user_moderates_channel
+from api.emote_set_cache import emote_set_cache
+from api.http_client import get_http_client
 import os
-import asyncio
-from datetime import datetime
+import json
 
 router = APIRouter()
 
@@ -33,33 +40,142 @@ class VoteEventUpdate(BaseModel):
     end_now: Optional[bool] = False
     specific_users: Optional[List[str]] = None
 
+VoteChoice = Literal["keep", "neutral", "remove"]
+
 class IndividualVoteSubmit(BaseModel):
     voting_event_id: int
     emote_id: str
-    vote_choice: str
+    vote_choice: VoteChoice
+
+class BatchVoteItem(BaseModel):
+    emote_id: str
+    vote_choice: VoteChoice
 
 class BatchVoteSubmit(BaseModel):
     voting_event_id: int
-    votes: List[dict]  # List of {"emote_id": str, "vote_choice": str}
+    votes: List[BatchVoteItem]
+
+
+def vote_upsert(values):
+    """Build a single INSERT ... ON CONFLICT DO UPDATE for one or many votes.
+
+    Rows whose choice is unchanged are left alone, so they come back from
+    RETURNING only when something was actually written. ``inserted`` is true
+    for brand new rows and false for changed choices.
+    """
+    stmt = pg_insert(IndividualVote).values(values)
+    return stmt.on_conflict_do_update(
+        constraint='uq_individual_votes_event_voter_emote',
+        set_={'vote_choice': stmt.excluded.vote_choice},
+        where=IndividualVote.vote_choice.is_distinct_from(stmt.excluded.vote_choice)
+    ).returning(
+        IndividualVote.voting_event_id,
+        IndividualVote.emote_id,
+        IndividualVote.vote_choice,
+        literal_column('(xmax = 0)').label('inserted')
+    )
 
+def tallies_changed_locally(event_id: int):
+    """After this worker commits a vote change: drop its cached /tallies so the
+    voter's next read includes their vote, and wake its live streams."""
+    tally_cache.invalidate(event_id)
+    tally_hub.notify(event_id)
+
+async def flush_buffered_votes(rows: List[dict]):
+    """Write a coalesced batch from the vote buffer in one statement and one commit."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(vote_upsert(rows))
+        changed_events = {row.voting_event_id for row in result.fetchall()}
+        await db.commit()
+    for event_id in changed_events:
+        tallies_changed_locally(event_id)
 
 async def can_user_edit_event(user: User, voting_event: VotingEvent, db: AsyncSession):
     if not user or not voting_event:
         return False
     
-    result = await db.execute(select(User).where(User.id == voting_event.creator_id))
-    vote_creator = result.scalar_one_or_none()
-    
-    if not vote_creator:
-        return False
-
     if user.id == voting_event.creator_id:
         return True
     
-    if vote_creator.moderators and user.twitch_username in vote_creator.moderators:
+    return await user_moderates_channel(db, voting_event.creator_id, user.id)
+
+async def can_user_view_event(user: User, voting_event: VotingEvent, db: AsyncSession) -> bool:
+    """The /votes/voting-events visibility rules for a single event."""
+    if await can_user_edit_event(user, voting_event, db):
         return True
-    
-    return False
+    if voting_event.permission_level == "all":
+        return True
+    if voting_event.permission_level == "specific":
+        result = await db.execute(select(is_in_event_audience(voting_event.id, user.twitch_username)))
+        return bool(result.scalar())
+    if voting_event.permission_level not in ("followers", "subscribers"):
+        return False
+
+    result = await db.execute(select(User.twitch_user_id).where(User.id == voting_event.creator_id))
+    creator_twitch_user_id = result.scalar_one_or_none()
+    if creator_twitch_user_id is None:
+        return False
+    if voting_event.permission_level == "followers":
+        return await check_user_follows_channel(user=user, channel_id=str(creator_twitch_user_id), db=db)
+    return await check_user_subscribed_to_channel(user=user, broadcaster_id=str(creator_twitch_user_id), db=db)
+
+def is_in_event_audience(event_id, twitch_username):
+    """EXISTS condition for "twitch_username was invited to this specific event"."""
+    return exists().where(EventAudience.event_id == event_id, EventAudience.twitch_username == twitch_username)
+
+async def get_event_audiences(db: AsyncSession, event_ids: List[int]) -> Dict[int, List[str]]:
+    """Invited usernames for each of the given events, in one query."""
+    if not event_ids:
+        return {}
+    result = await db.execute(
+        select(EventAudience.event_id, EventAudience.twitch_username)
+        .where(EventAudience.event_id.in_(event_ids))
+        .order_by(EventAudience.event_id, EventAudience.twitch_username)
+    )
+    audiences = {}
+    for row in result.all():
+        audiences.setdefault(row.event_id, []).append(row.twitch_username)
+    return audiences
+
+async def add_event_audience(db: AsyncSession, event_id: int, usernames: List[str]):
+    if not usernames:
+        return
+    await db.execute(
+        pg_insert(EventAudience)
+        .values([{"event_id": event_id, "twitch_username": username} for username in set(usernames)])
+        .on_conflict_do_nothing()
+    )
+
+async def add_event_emotes(db: AsyncSession, event_id: int, emotes: List[dict]):
+    """Snapshot the event's emotes in set order, in one insert"""
+    rows = []
+    seen = set()
+    for emote in emotes:
+        if emote['id'] in seen:
+            continue
+        seen.add(emote['id'])
+        rows.append({"event_id": event_id, "ordinal": len(rows), "emote_id": emote['id'], "name": emote['name']})
+    if not rows:
+        return
+    await db.execute(pg_insert(EventEmote).values(rows).on_conflict_do_nothing())
+
+async def get_event_emotes(db: AsyncSession, event_id: int) -> List[dict]:
+    result = await db.execute(
+        select(EventEmote.emote_id, EventEmote.name)
+        .where(EventEmote.event_id == event_id)
+        .order_by(EventEmote.ordinal)
+    )
+    return [{"id": emote_id, "name": name} for emote_id, name in result.all()]
+
+async def load_emote_set_emotes(emote_set_id: str) -> Optional[List[dict]]:
+    # The result is stored for good, so it must be within the cache TTL rather
+    # than a stale-while-revalidate snapshot
+    try:
+        emote_set = await emote_set_cache.get(emote_set_id, fresh=True)
+    except Exception as e:
+        print(f"[EVENT EMOTES] Could not load emote set {emote_set_id}: {str(e)}")
+        return None
+    return emote_set['emotes'] if emote_set else None
 
 @router.put('/votes/update/{event_id}')
 async def update_voting_event(event_id: int, update_data: VoteEventUpdate, request: Request, db: AsyncSession = Depends(get_database)):
@@ -83,28 +199,20 @@ async def update_voting_event(event_id: int, update_data: VoteEventUpdate, reque
     # Step 4: Handle end_now first (and return immediately)
     if update_data.end_now:
         event.end_time = datetime.now(dt_timezone.utc)
+        # Duration events end by end_time from now on, like any other edit
+        event.active_time_tab = "endTime"
         event.is_active = False
         await db.commit()
         # Refresh the event to get updated values
         await db.refresh(event)
 
         # Build event_data similar to get_voting_event_by_id
-        if event.active_time_tab == "duration":
-            end_time = event.created_at + timedelta(hours=event.duration_hours)
-        elif event.active_time_tab == "endTime":
-            end_time = event.end_time
+        end_time = event.effective_end_time
 
         now = datetime.now(dt_timezone.utc)
         is_currently_active = end_time > now
 
-        # Get voter count
-        voter_counts = await db.execute(
-            select(
-                func.count(func.distinct(IndividualVote.voter_id)).label('unique_voters')
-            )
-            .where(IndividualVote.voting_event_id == event.id)
-        )
-        voter_count = voter_counts.scalar() or 0
+        voter_count = event.voter_count
 
         # Get creator username
         result = await db.execute(select(User).where(User.id == event.creator_id))
@@ -141,6 +249,8 @@ async def update_voting_event(event_id: int, update_data: VoteEventUpdate, reque
         # Update
         event.end_time = update_data.end_time
         event.active_time_tab = "endTime"
+        # The new end is in the future, so an already-expired event reopens
+        event.is_active = True
 
     elif update_data.time_tab == "duration" and update_data.duration_hours:
         # Calculate what the end time would be
@@ -156,67 +266,57 @@ async def update_voting_event(event_id: int, update_data: VoteEventUpdate, reque
         # Update - SWITCH TO ENDTIME MODE!
         event.end_time = new_end_time
         event.active_time_tab = "endTime"  # Change from duration to endTime
+        event.is_active = True
 
     # Step 7: Update specific_users if provided (only for "specific" permission events)
+    tallies_changed = False
     if update_data.specific_users is not None:
         if event.permission_level != "specific" and event.permission_level != "specific_users":
             return {"success": False, "message": "Can only update specific_users for specific permission events"}
         
-        # Get current users and new users
-        old_users = set(event.specific_users or [])
-        new_users = set(update_data.specific_users)
-        
-        # Find users being removed
-        removed_users = old_users - new_users
-        
-        # Delete votes from removed users
-        if removed_users:
-            # Get user IDs for removed usernames
-            removed_user_ids = []
-            for username in removed_users:
-                user_result = await db.execute(select(User).where(User.twitch_username == username))
-                removed_user = user_result.scalar_one_or_none()
-                if removed_user:
-                    removed_user_ids.append(removed_user.id)
-            
-            # Delete all votes from removed users for this event
-            if removed_user_ids:
-                await db.execute(
-                    delete(IndividualVote).where(
-                        IndividualVote.voting_event_id == event.id,
-                        IndividualVote.voter_id.in_(removed_user_ids)
-                    )
+        new_users = list(set(update_data.specific_users))
+
+        # Drop everyone not on the new list and, in the same statement, the
+        # votes they already cast in this event
+        removed_users = (
+            delete(EventAudience)
+            .where(EventAudience.event_id == event.id, EventAudience.twitch_username.notin_(new_users))
+            .returning(EventAudience.twitch_username)
+            .cte('removed_users')
+        )
+        result = await db.execute(
+            delete(IndividualVote)
+            .where(
+                IndividualVote.voting_event_id == event.id,
+                IndividualVote.voter_id.in_(
+                    select(User.id).join(removed_users, User.twitch_username == removed_users.c.twitch_username)
                 )
-        
-        # Update the specific_users list
-        event.specific_users = update_data.specific_users
-        
-        # Flag the ARRAY field as modified so SQLAlchemy detects the change
-        from sqlalchemy.orm import attributes
-        attributes.flag_modified(event, 'specific_users')
+            )
+            .returning(IndividualVote.emote_id, IndividualVote.vote_choice)
+            .add_cte(removed_users)
+            .execution_options(synchronize_session=False)
+        )
+        deleted_votes = result.fetchall()
+        if deleted_votes:
+            tallies_changed = True
+
+        await add_event_audience(db, event.id, new_users)
 
     # Step 8: Commit once at the end
     await db.commit()
+    if tallies_changed:
+        tallies_changed_locally(event.id)
     # Refresh the event to get updated values
     await db.refresh(event)
 
     # Build event_data similar to get_voting_event_by_id
-    if event.active_time_tab == "duration":
-        end_time = event.created_at + timedelta(hours=event.duration_hours)
-    elif event.active_time_tab == "endTime":
-        end_time = event.end_time
+    end_time = event.effective_end_time
+    schedule_event_expiry(event.id, end_time)
 
     now = datetime.now(dt_timezone.utc)
     is_currently_active = end_time > now
 
-    # Get voter count
-    voter_counts = await db.execute(
-        select(
-            func.count(func.distinct(IndividualVote.voter_id)).label('unique_voters')
-        )
-        .where(IndividualVote.voting_event_id == event.id)
-    )
-    voter_count = voter_counts.scalar() or 0
+    voter_count = event.voter_count
 
     # Get creator username
     result = await db.execute(select(User).where(User.id == event.creator_id))
@@ -278,56 +378,45 @@ async def submit_individual_vote(vote_data: IndividualVoteSubmit, request: Reque
         return {"success": False, "message": "Event not found"}
     
     # Calculate if event is currently active
-    if voting_event.active_time_tab == "duration":
-        end_time = voting_event.created_at + timedelta(hours=voting_event.duration_hours)
-    elif voting_event.active_time_tab == "endTime":
-        end_time = voting_event.end_time
+    end_time = voting_event.effective_end_time
     
     now = datetime.now(dt_timezone.utc)
     is_currently_active = end_time > now
     
-    # Update database if event has expired
-    if not is_currently_active and voting_event.is_active:
-        voting_event.is_active = False
-        await db.commit()
-    
-    # Prevent voting on expired events
+    # Prevent voting on expired events (is_active itself is flipped by the expiry scheduler)
     if not is_currently_active:
         return {"success": False, "message": "This voting event has expired"}
     
-    result = await db.execute(
-        select(IndividualVote).where(
-            IndividualVote.voter_id == int(user.id), 
-            IndividualVote.voting_event_id == vote_data.voting_event_id, 
-            IndividualVote.emote_id == vote_data.emote_id
-            ))
-    vote = result.scalar_one_or_none()
-    if vote and vote.vote_choice != vote_data.vote_choice:
-        try:
-            vote.vote_choice = vote_data.vote_choice
-            await db.commit()
-            return {'success': True, 'message': 'Vote updated successfully'}
-        except Exception as e:
-            await db.rollback()
-            return {"success": False, "message": f"Failed to update vote: {str(e)}"}
-    elif vote and vote.vote_choice == vote_data.vote_choice:
-        return {'success': True, 'message': 'Vote doesn\'t need updating'}
-
-    individual_vote = IndividualVote(
-        voting_event_id = vote_data.voting_event_id,
-        voter_id = int(user.id),
-        emote_id = vote_data.emote_id,
-        vote_choice = vote_data.vote_choice
-    )
+    vote_buffer = get_vote_buffer()
+    if vote_buffer:
+        key = (vote_data.voting_event_id, int(user.id), vote_data.emote_id)
+        if not await vote_buffer.put([(key, vote_data.vote_choice)]):
+            return {"success": False, "message": "Server is busy, please try voting again"}
+        return {"success": True, "message": "Vote queued"}
+
+    # Single round trip: insert, or flip the existing choice, or no-op if unchanged
+    stmt = vote_upsert({
+        'voting_event_id': vote_data.voting_event_id,
+        'voter_id': int(user.id),
+        'emote_id': vote_data.emote_id,
+        'vote_choice': vote_data.vote_choice
+    })
 
     try:
-        db.add(individual_vote)
+        result = await db.execute(stmt)
+        written = result.first()
         await db.commit()
-        return {"success": True, "message": "Vote submitted successfully"}
     except Exception as e:
         await db.rollback()
         return {"success": False, "message": f"Failed to submit vote: {str(e)}"}
 
+    if written is None:
+        return {'success': True, 'message': 'Vote doesn\'t need updating'}
+    tallies_changed_locally(vote_data.voting_event_id)
+    if written.inserted:
+        return {"success": True, "message": "Vote submitted successfully"}
+    return {'success': True, 'message': 'Vote updated successfully'}
+
 @router.post('/votes/submit-batch')
 async def submit_batch_votes(batch_data: BatchVoteSubmit, request: Request, db: AsyncSession = Depends(get_database)):
     """OPTIMIZATION: Batch create multiple neutral votes in a single API call."""
@@ -348,84 +437,72 @@ async def submit_batch_votes(batch_data: BatchVoteSubmit, request: Request, db:
         return {"success": False, "message": "Event not found"}
     
     # Calculate if event is currently active
-    if voting_event.active_time_tab == "duration":
-        end_time = voting_event.created_at + timedelta(hours=voting_event.duration_hours)
-    elif voting_event.active_time_tab == "endTime":
-        end_time = voting_event.end_time
+    end_time = voting_event.effective_end_time
     
     now = datetime.now(dt_timezone.utc)
     is_currently_active = end_time > now
     
-    # Update database if event has expired
-    if not is_currently_active and voting_event.is_active:
-        voting_event.is_active = False
-        await db.commit()
-    
-    # Prevent voting on expired events
+    # Prevent voting on expired events (is_active itself is flipped by the expiry scheduler)
     if not is_currently_active:
         return {"success": False, "message": "This voting event has expired"}
     
+    vote_buffer = get_vote_buffer()
+    if vote_buffer:
+        buffered = [
+            ((batch_data.voting_event_id, int(user.id), vote.emote_id), vote.vote_choice)
+            for vote in batch_data.votes
+        ]
+        if not await vote_buffer.put(buffered):
+            return {"success": False, "message": "Server is busy, please try again"}
+        return {
+            "success": True,
+            "message": f"Batch votes queued: {len(buffered)}",
+            "queued": len(buffered)
+        }
+
     batch_start_time = datetime.now()
     print(f"[BATCH VOTES] Starting batch creation of {len(batch_data.votes)} votes...")
     
-    # Check which votes already exist
-    emote_ids = [vote['emote_id'] for vote in batch_data.votes]
-    existing_votes_result = await db.execute(
-        select(IndividualVote).where(
-            IndividualVote.voter_id == int(user.id),
-            IndividualVote.voting_event_id == batch_data.voting_event_id,
-            IndividualVote.emote_id.in_(emote_ids)
-        )
-    )
-    existing_votes = existing_votes_result.fetchall()
-    existing_vote_map = {(v.voting_event_id, v.emote_id): v for v in existing_votes}
-    
-    # Create new votes and track results
-    votes_to_create = []
-    votes_skipped = 0
-    votes_updated = 0
-    
-    for vote_data in batch_data.votes:
-        emote_id = vote_data['emote_id']
-        vote_choice = vote_data['vote_choice']
-        
-        # Check if vote already exists
-        existing_vote = existing_vote_map.get((batch_data.voting_event_id, emote_id))
-        
-        if existing_vote:
-            if existing_vote.vote_choice != vote_choice:
-                # Update existing vote
-                existing_vote.vote_choice = vote_choice
-                votes_updated += 1
-            else:
-                # Vote already exists with same choice
-                votes_skipped += 1
-        else:
-            # Create new vote
-            individual_vote = IndividualVote(
-                voting_event_id=batch_data.voting_event_id,
-                voter_id=int(user.id),
-                emote_id=emote_id,
-                vote_choice=vote_choice
-            )
-            votes_to_create.append(individual_vote)
-    
-    # Batch add all new votes
-    if votes_to_create:
-        db.add_all(votes_to_create)
-    
+    # One vote per emote; if the client sent duplicates the last one wins
+    choices_by_emote = {vote.emote_id: vote.vote_choice for vote in batch_data.votes}
+    if not choices_by_emote:
+        return {"success": True, "message": "No votes to submit", "created": 0, "updated": 0, "skipped": 0}
+
+    stmt = vote_upsert([
+        {
+            'voting_event_id': batch_data.voting_event_id,
+            'voter_id': int(user.id),
+            'emote_id': emote_id,
+            'vote_choice': vote_choice
+        }
+        for emote_id, vote_choice in choices_by_emote.items()
+    ])
+
+    try:
+        result = await db.execute(stmt)
+        written = result.fetchall()
+    except Exception as e:
+        await db.rollback()
+        return {"success": False, "message": f"Failed to submit batch votes: {str(e)}"}
+
+    votes_created = sum(1 for row in written if row.inserted)
+    votes_updated = len(written) - votes_created
+    votes_skipped = len(batch_data.votes) - len(written)
+
     try:
         await db.commit()
+        if written:
+            tallies_changed_locally(batch_data.voting_event_id)
         batch_end_time = datetime.now()
         batch_duration = (batch_end_time - batch_start_time).total_seconds() * 1000
         
-        print(f"[BATCH VOTES] Completed in {batch_duration:.2f}ms: {len(votes_to_create)} created, {votes_updated} updated, {votes_skipped} skipped")
+        print(f"[BATCH VOTES] Completed in {batch_duration:.2f}ms: {votes_created} created, {votes_updated} updated, {votes_skipped} skipped")
         print(f"[BATCH VOTES] Saved {len(batch_data.votes)} individual API calls by batching")
         
         return {
             "success": True,
-            "message": f"Batch votes submitted: {len(votes_to_create)} created, {votes_updated} updated, {votes_skipped} skipped",
-            "created": len(votes_to_create),
+            "message": f"Batch votes submitted: {votes_created} created, {votes_updated} updated, {votes_skipped} skipped",
+            "created": votes_created,
             "updated": votes_updated,
             "skipped": votes_skipped
         }
@@ -433,8 +510,21 @@ async def submit_batch_votes(batch_data: BatchVoteSubmit, request: Request, db:
         await db.rollback()
         return {"success": False, "message": f"Failed to submit batch votes: {str(e)}"}
 
+# Page size for /votes/voting-events
+VOTING_EVENTS_PAGE_SIZE = 50
+VOTING_EVENTS_MAX_PAGE_SIZE = 200
+# Subscriber-only events are filtered after the query, so a page may need
+# more than one read; past this many the page is returned short
+VOTING_EVENTS_MAX_PAGE_QUERIES = 4
+
 @router.get('/votes/voting-events')
-async def get_voting_events(request: Request, db: AsyncSession = Depends(get_database)):
+async def get_voting_events(request: Request, status: Optional[str] = None, cursor: Optional[int] = None, limit: int = VOTING_EVENTS_PAGE_SIZE, db: AsyncSession = Depends(get_database)):
+    """Events visible to the caller, one keyset page at a time.
+
+    Without ``status`` the first page of both active and expired events is
+    returned. Pass ``status=active|expired`` with the matching cursor from
+    ``next_cursors`` to fetch the following pages of one list.
+    """
     user_session = request.session.get('user')
     if not user_session:
         return {"success": False, "message": "User not in session"}
@@ -444,277 +534,197 @@ async def get_voting_events(request: Request, db: AsyncSession = Depends(get_dat
     if not user: 
         return {"success": False, "message": "User not in database"}
 
+    if status not in (None, "active", "expired"):
+        return {"success": False, "message": "status must be 'active' or 'expired'"}
+    limit = max(1, min(limit, VOTING_EVENTS_MAX_PAGE_SIZE))
+
     Creator = aliased(User)
     Owner = aliased(User)
+    now = datetime.now(dt_timezone.utc)
 
-    result = await db.execute(
+    async def fetch_followed_channels():
+        try:
+            followed = await follow_cache.get(user.id)
+            return followed if followed is not None else frozenset()
+        except Exception as e:
+            print(f"[BATCH TWITCH API] Error fetching followed channels: {str(e)}")
+            return frozenset()  # Empty set on error
+
+    async def check_subscriptions(broadcaster_ids):
+        try:
+            return await check_user_subscriptions(user, broadcaster_ids, db)
+        except Exception as e:
+            print(f"[BATCH TWITCH API] Error checking subscriptions: {str(e)}")
+            return {broadcaster_id: False for broadcaster_id in broadcaster_ids}
+
+    # Everything except subscriber-only events is decided in SQL; the follow
+    # list comes from the follow cache and goes into the query as an IN list
+    is_creator_or_mod = or_(
+        VotingEvent.creator_id == user.id,
+        is_moderator_of(VotingEvent.creator_id, user.id)
+    )
+    in_requested_lists = True
+    if status == "active":
+        in_requested_lists = VotingEvent.effective_end_time > now
+    elif status == "expired":
+        in_requested_lists = VotingEvent.effective_end_time <= now
+    visible_conditions = [
+        is_creator_or_mod,
+        VotingEvent.permission_level == "all",
+        and_(VotingEvent.permission_level == "specific", is_in_event_audience(VotingEvent.id, user_session["login"])),
+        VotingEvent.permission_level == "subscribers"
+    ]
+
+    # The follow list can take a full paginated Helix walk to load, so only
+    # fetch it when some follower-only event could be on these pages
+    result = await db.execute(select(exists().where(
+        VotingEvent.permission_level == "followers",
+        ~is_creator_or_mod,
+        in_requested_lists
+    )))
+    if result.scalar():
+        followed_channels_set = await fetch_followed_channels()
+        if followed_channels_set:
+            visible_conditions.append(and_(
+                VotingEvent.permission_level == "followers",
+                Creator.twitch_user_id.in_(list(followed_channels_set))
+            ))
+    visible = or_(*visible_conditions)
+    events_query = (
         select(
             VotingEvent, 
             Owner.twitch_username,      
             Owner.twitch_user_id, 
-            Creator.moderators,          
             Creator.twitch_username,
-            Creator.twitch_user_id 
+            Creator.twitch_user_id,
+            is_creator_or_mod.label('is_creator_or_mod'),
         )
         .outerjoin(Owner, VotingEvent.emote_set_owner_id == Owner.id)
         .join(Creator, VotingEvent.creator_id == Creator.id)
-        .order_by(VotingEvent.id.asc())  
+        .where(visible)
     )
 
-    voter_counts = await db.execute(
-        select(
-            IndividualVote.voting_event_id,
-            func.count(func.distinct(IndividualVote.voter_id)).label('unique_voters')
-        )
-        .group_by(IndividualVote.voting_event_id)
-    )
-    voter_counts_dict = {row.voting_event_id: row.unique_voters for row in voter_counts.fetchall()}
+    # Subscription lookups are done at most once per broadcaster per request,
+    # however many pages of candidates they are needed for
+    subscriber_results = {}
 
-    voting_events = result.fetchall()
+    async def filter_subscriber_only(rows):
+        needs_sub = {
+            str(row[4]) for row in rows
+            if not row.is_creator_or_mod and row[0].permission_level == "subscribers"
+        } - subscriber_results.keys()
+        if needs_sub:
+            print(f"[BATCH TWITCH API] Checking {len(needs_sub)} subscription statuses...")
+            subscriber_results.update(await check_subscriptions(needs_sub))
+
+        return [
+            row for row in rows
+            if row.is_creator_or_mod
+            or row[0].permission_level != "subscribers"
+            or subscriber_results.get(str(row[4]), False)
+        ]
+
+    async def fetch_page(active: bool, after_id: Optional[int]):
+        # Keyset pagination on id. Subscriber-only candidates can be dropped
+        # after the query, so keep reading until the page is full, rows run
+        # out or VOTING_EVENTS_MAX_PAGE_QUERIES reads were made.
+        page_query = events_query.where(VotingEvent.effective_end_time > now if active else VotingEvent.effective_end_time <= now)
+        allowed = []
+        more = False
+        for _ in range(VOTING_EVENTS_MAX_PAGE_QUERIES):
+            query = page_query
+            if after_id is not None:
+                query = query.where(VotingEvent.id > after_id)
+            result = await db.execute(query.order_by(VotingEvent.id.asc()).limit(limit + 1))
+            rows = result.fetchall()
+            allowed.extend(await filter_subscriber_only(rows))
+            more = len(rows) > limit
+            if rows:
+                after_id = rows[-1][0].id
+            if not more or len(allowed) > limit:
+                break
+        if len(allowed) > limit:
+            page = allowed[:limit]
+            return page, page[-1][0].id
+        # A short page still gets a cursor if the read cap cut it off
+        return allowed, after_id if more else None
 
-    # OPTIMIZATION #4: Batch Twitch API calls for follower/subscriber checks
     batch_start_time = datetime.now()
-    
-    # Collect events that need permission checks
-    events_needing_follower_check = []  # List of (row, creator_twitch_user_id)
-    events_needing_subscriber_check = []  # List of (row, creator_twitch_user_id)
-    
-    # First pass: categorize events by permission type
-    for row in voting_events:
-        event = row[0]
-        creator_twitch_user_id = row[5]
-        
-        # Skip if user is creator or mod (already has access)
-        creator_moderators = row[3]
-        if user.id == event.creator_id or (creator_moderators and user.twitch_username in creator_moderators):
-            continue
-            
-        # Categorize events needing API checks
-        if event.permission_level == "followers":
-            events_needing_follower_check.append((row, str(creator_twitch_user_id)))
-        elif event.permission_level == "subscribers":
-            events_needing_subscriber_check.append((row, str(creator_twitch_user_id)))
-    
-    # Fetch followed channels ONCE (if needed)
-    followed_channels_set = set()
-    if events_needing_follower_check:
-        print(f"[BATCH TWITCH API] Fetching followed channels for {len(events_needing_follower_check)} follower checks...")
-        try:
-            user_id = user.twitch_user_id
-            # Get access token from ChannelTokens (stored for this user)
-            token_result = await db.execute(
-                select(ChannelTokens).where(ChannelTokens.user_id == user.id)
-            )
-            channel_token = token_result.scalar_one_or_none()
-            if not channel_token or not channel_token.access_token:
-                print(f"[BATCH TWITCH API] No access token found for user {user.twitch_username}")
-                followed_channels_set = set()  # Empty set if no token
-            else:
-                access_token = channel_token.access_token
-                client_id = os.getenv("TWITCH_CLIENT_ID")
-                
-                async with httpx.AsyncClient() as client:
-                    all_followed_channels = []
-                    cursor = None
-                    
-                    while True:
-                        url = f"https://api.twitch.tv/helix/channels/followed?user_id={user_id}&first=100"
-                        if cursor:
-                            url += f"&after={cursor}"
-                        
-                        following_response = await client.get(
-                            url,
-                            headers={
-                                "Authorization": f"Bearer {access_token}",
-                                "Client-Id": client_id
-                            }
-                        )
-                        
-                        if following_response.status_code != 200:
-                            print(f"[BATCH TWITCH API] Error fetching followed channels: {following_response.status_code}")
-                            break
-                        
-                        following_data = following_response.json()
-                        if 'error' in following_data:
-                            break
-                        
-                        page_data = following_data.get('data', [])
-                        all_followed_channels.extend(page_data)
-                        
-                        cursor = following_data.get('pagination', {}).get('cursor')
-                        if not cursor:
-                            break
-                    
-                    # Create set of broadcaster IDs for O(1) lookup
-                    followed_channels_set = {ch.get('broadcaster_id') for ch in all_followed_channels}
-                    print(f"[BATCH TWITCH API] Fetched {len(followed_channels_set)} total followed channels in single API call (will check {len(events_needing_follower_check)} events against this set)")
-        except Exception as e:
-            print(f"[BATCH TWITCH API] Error fetching followed channels: {str(e)}")
-            followed_channels_set = set()  # Empty set on error
-    
-    # Batch subscriber checks in parallel
-    subscriber_results = {}
-    if events_needing_subscriber_check:
-        print(f"[BATCH TWITCH API] Checking {len(events_needing_subscriber_check)} subscription statuses in parallel...")
-        async def check_subscription(row_and_id):
-            row, broadcaster_id = row_and_id
-            try:
-                result = await check_user_subscribed_to_channel(user, broadcaster_id, db)
-                return (broadcaster_id, result)
-            except Exception as e:
-                print(f"[BATCH TWITCH API] Error checking subscription for {broadcaster_id}: {str(e)}")
-                return (broadcaster_id, False)
-        
-        subscription_checks = await asyncio.gather(*[check_subscription(item) for item in events_needing_subscriber_check])
-        subscriber_results = {broadcaster_id: result for broadcaster_id, result in subscription_checks}
-        print(f"[BATCH TWITCH API] Completed {len(subscription_checks)} subscription checks in parallel")
-    
-    batch_end_time = datetime.now()
-    batch_duration = (batch_end_time - batch_start_time).total_seconds() * 1000
-    print(f"[BATCH TWITCH API] Total batch API time: {batch_duration:.2f}ms (saved {len(events_needing_follower_check)} individual follower API calls)")
-    
-    # Second pass: check permissions using cached/batched results
-    allowed_events = []
-    
-    for row in voting_events:
-        event = row[0]
-        owner_username = row[1]      
-        owner_twitch_id = row[2]
-        print(f"DEBUG: owner_twitch_id = {owner_twitch_id}, type = {type(owner_twitch_id)}")   
-        creator_moderators = row[3]  
-        creator_username = row[4]
-        creator_twitch_user_id = row[5]
-        print(f"Debug - Event {event.id}: owner_username={owner_username}, creator_username={creator_username}")   
-
-        user_can_access = False
-        # Event creator always has access
-        if user.id == event.creator_id:
-            user_can_access = True
-        # Moderators of the creator also have access
-        elif creator_moderators and user.twitch_username in creator_moderators:
-            user_can_access = True
-        else:
-            # Check permission levels for everyone else
-            # DEBUG: Log permission check
-            print(f"[PERMISSION DEBUG] Event {event.id}: permission_level='{event.permission_level}' (type: {type(event.permission_level)}, repr: {repr(event.permission_level)})")
-            print(f"[PERMISSION DEBUG] Event {event.id}: Comparing '{event.permission_level}' == 'all': {event.permission_level == 'all'}")
-            if event.permission_level == "all":
-                user_can_access = True 
-            elif event.permission_level == "specific":
-                if event.specific_users and user_session["login"] in event.specific_users:
-                    user_can_access = True  
-            elif event.permission_level == "followers":
-                # Use cached followed channels set
-                user_can_access = str(creator_twitch_user_id) in followed_channels_set
-            elif event.permission_level == "subscribers":
-                # Use cached subscription result
-                user_can_access = subscriber_results.get(str(creator_twitch_user_id), False)
-            print(f"[PERMISSION DEBUG] Event {event.id}: user_can_access={user_can_access} after permission check")
-
-        if user_can_access:
-            allowed_events.append(row)
-    
-    # Replace the current response_events list building with:
+    pages = {}
+    if status in (None, "active"):
+        pages["active"] = await fetch_page(True, cursor if status else None)
+    if status in (None, "expired"):
+        pages["expired"] = await fetch_page(False, cursor if status else None)
+    batch_duration = (datetime.now() - batch_start_time).total_seconds() * 1000
+    print(f"[VOTING EVENTS] Loaded {', '.join(f'{len(rows)} {name}' for name, (rows, _) in pages.items())} events in {batch_duration:.2f}ms")
+
+    # Audiences for every specific event on these pages in one query
+    audiences = await get_event_audiences(db, [
+        row[0].id for rows, _ in pages.values() for row in rows if row[0].permission_level == "specific"
+    ])
+
     active_events = []
     expired_events = []
-    
-    # OPTIMIZATION #2: Batch database commits
-    events_to_expire = []
-    commit_count_before = 0
-    total_events_checked = 0
-    already_expired_count = 0
-
-    for row in allowed_events:
-        event = row[0]
-        owner_username = row[1] 
-        owner_twitch_id = row[2]  # Add this if missing
-        creator_moderators = row[3]
-        creator_username = row[4]  # ADD THIS LINE - extract creator username
-        
-        # Calculate end time
-        if event.active_time_tab == "duration":
-            end_time = event.created_at + timedelta(hours=event.duration_hours)
-        elif event.active_time_tab == "endTime":
-            end_time = event.end_time
 
-        now = datetime.now(dt_timezone.utc)
-
-        is_currently_active = end_time > now
-        total_events_checked += 1
-        
-        # OPTIMIZATION #2: Collect events that need to be expired (batch commit later)
-        if not is_currently_active and event.is_active:
-            event.is_active = False
-            events_to_expire.append(event)
-            commit_count_before += 1
-            print(f"[BATCH COMMIT DEBUG] Event {event.id} needs to be expired (was active, now expired)")
-        elif not is_currently_active and not event.is_active:
-            already_expired_count += 1
-        
-        # Build event data
-        event_data = {
-            "id": event.id,
-            "title": event.title,
-            "creator_username": creator_username or "Unknown",  # Keep this for filtering/search
-            "owner_username": owner_username or "Unknown",  # ADD THIS - for display
-            "owner_twitch_id": owner_twitch_id,
-            "emote_set_name": event.emote_set_name,
-            "emote_set_id": event.emote_set_id,
-            "total_votes": voter_counts_dict.get(event.id, 0),
-            "is_active": is_currently_active,
-            "can_edit": user.id == event.creator_id or (creator_moderators and user.twitch_username in creator_moderators),  
-            "permission_level": event.permission_level,
-            "specific_users": event.specific_users or []
-        }
-        print(f"DEBUG: event_data for event {event.id}: owner_twitch_id = {event_data.get('owner_twitch_id')}")
-        
-        if is_currently_active:
-            # Calculate time remaining for active events
-            remaining = end_time - now
-            days = remaining.days
-            hours = remaining.seconds // 3600
-            minutes = (remaining.seconds % 3600) // 60
-            seconds = remaining.seconds % 60  
-
-            # Format as DD:HH:MM (always show all three, pad with zeros)
-            days_str = str(days).zfill(2)
-            hours_str = str(hours).zfill(2)
-            minutes_str = str(minutes).zfill(2)
-            time_left = f"{days_str}:{hours_str}:{minutes_str}"
-            event_data["time_remaining"] = time_left
-            event_data["end_time"] = end_time.isoformat()  # Add end_time for live countdown
-            active_events.append(event_data)
-        else:
-            # Calculate how long ago it ended
-            expired_time = now - end_time
-            if expired_time.days > 0:
-                time_ended = f"Ended {expired_time.days} days ago"
-            elif expired_time.seconds > 3600:
-                hours_ago = expired_time.seconds // 3600
-                time_ended = f"Ended {hours_ago} hours ago"
-            else:
-                time_ended = "Recently ended"
+    for name, (rows, _) in pages.items():
+        for row in rows:
+            event = row[0]
+            owner_username = row[1] 
+            owner_twitch_id = row[2]
+            creator_username = row[3]
+            end_time = event.effective_end_time
+            is_currently_active = name == "active"
             
-            event_data["time_ended"] = time_ended
-            expired_events.append(event_data)
-    
-    # OPTIMIZATION #2: Batch commit all expired events at once
-    print(f"[BATCH COMMIT DEBUG] Checked {total_events_checked} events: {len(events_to_expire)} need expiring, {already_expired_count} already expired")
+            # Build event data
+            event_data = {
+                "id": event.id,
+                "title": event.title,
+                "creator_username": creator_username or "Unknown",  # Keep this for filtering/search
+                "owner_username": owner_username or "Unknown",  # ADD THIS - for display
+                "owner_twitch_id": owner_twitch_id,
+                "emote_set_name": event.emote_set_name,
+                "emote_set_id": event.emote_set_id,
+                "total_votes": event.voter_count,
+                "is_active": is_currently_active,
+                "can_edit": row.is_creator_or_mod,
+                "permission_level": event.permission_level,
+                "specific_users": audiences.get(event.id, [])
+            }
+            
+            if is_currently_active:
+                # Calculate time remaining for active events
+                remaining = end_time - now
+                days = remaining.days
+                hours = remaining.seconds // 3600
+                minutes = (remaining.seconds % 3600) // 60
+
+                # Format as DD:HH:MM (always show all three, pad with zeros)
+                days_str = str(days).zfill(2)
+                hours_str = str(hours).zfill(2)
+                minutes_str = str(minutes).zfill(2)
+                time_left = f"{days_str}:{hours_str}:{minutes_str}"
+                event_data["time_remaining"] = time_left
+                event_data["end_time"] = end_time.isoformat()  # Add end_time for live countdown
+                active_events.append(event_data)
+            else:
+                # Calculate how long ago it ended
+                expired_time = now - end_time
+                if expired_time.days > 0:
+                    time_ended = f"Ended {expired_time.days} days ago"
+                elif expired_time.seconds > 3600:
+                    hours_ago = expired_time.seconds // 3600
+                    time_ended = f"Ended {hours_ago} hours ago"
+                else:
+                    time_ended = "Recently ended"
+                
+                event_data["time_ended"] = time_ended
+                expired_events.append(event_data)
     
-    if events_to_expire:
-        commit_batch_start_time = datetime.now()
-        await db.commit()
-        commit_batch_end_time = datetime.now()
-        commit_batch_duration = (commit_batch_end_time - commit_batch_start_time).total_seconds() * 1000
-        print(f"[BATCH COMMIT] Expired {len(events_to_expire)} events in single commit ({commit_batch_duration:.2f}ms)")
-        print(f"[BATCH COMMIT] Saved {commit_count_before} individual commits by batching")
-    else:
-        print(f"[BATCH COMMIT] No events needed expiring (all {total_events_checked} events already processed)")
-
     return {
         "success": True, 
         "active_events": active_events,
-        "expired_events": expired_events
+        "expired_events": expired_events,
+        "next_cursors": {name: next_cursor for name, (_, next_cursor) in pages.items()}
     }
 
 @router.post('/votes/create')
@@ -733,18 +743,18 @@ async def create_vote(vote_data: VoteEventCreate, request: Request, db: AsyncSes
         # Refresh 7TV ID if it looks like a placeholder
         if user.sevenTV_id and user.sevenTV_id.startswith("no_account_"):
             base_url = os.getenv("BASE_URL")
-            async with httpx.AsyncClient() as client:
-                seventv_response = await client.get(f"{base_url}/users/{user.twitch_username}")
-                if seventv_response.status_code == 200:
-                    seventv_data = seventv_response.json()
-                    if seventv_data and 'id' in seventv_data:
-                        user.sevenTV_id = seventv_data['id']
-                        await db.commit()
-                    else:
-                        return {"success": False, "message": "You need a 7TV account to create voting events. Please create one at 7tv.app and sign in again."}
+            client = get_http_client()
+            seventv_response = await client.get(f"{base_url}/users/{user.twitch_username}")
+            if seventv_response.status_code == 200:
+                seventv_data = seventv_response.json()
+                if seventv_data and 'id' in seventv_data:
+                    user.sevenTV_id = seventv_data['id']
+                    await db.commit()
                 else:
                     return {"success": False, "message": "You need a 7TV account to create voting events. Please create one at 7tv.app and sign in again."}
-        
+            else:
+                return {"success": False, "message": "You need a 7TV account to create voting events. Please create one at 7tv.app and sign in again."}
+
         # Final check: if still placeholder after refresh attempt, reject
         if user.sevenTV_id and user.sevenTV_id.startswith("no_account_"):
             return {"success": False, "message": "You need a 7TV account to create voting events. Please create one at 7tv.app and sign in again."}
@@ -781,13 +791,20 @@ async def create_vote(vote_data: VoteEventCreate, request: Request, db: AsyncSes
         if not emote_set_owner:
             return {"success": False, "message": "Emote set owner not found"}
         
-        if user.twitch_username not in emote_set_owner.moderators:
+        if not await user_moderates_channel(db, emote_set_owner.id, user.id):
             return {"success": False, "message": "Permission denied: cannot create votes for this user"}
 
     print(f"Vote data: {vote_data}")
     print(f"Specific users: {getattr(vote_data, 'specific_users', 'NOT_FOUND')}")
     print(f"Permissions: {vote_data.permissions}")
 
+    # Snapshot of the set's emotes taken now, so the list can't change mid-vote
+    emotes = await load_emote_set_emotes(vote_data.emoteSet['id'])
+    if emotes is None:
+        return {"success": False, "message": "Could not load the emote set from 7TV. Please try again."}
+    if not emotes:
+        return {"success": False, "message": "This emote set has no emotes to vote on."}
+
     # Get the emote set owner
     owner_result = await db.execute(select(User).where(User.twitch_username == vote_data.emoteSetOwner))
     emote_set_owner = owner_result.scalar_one_or_none()
@@ -805,8 +822,7 @@ async def create_vote(vote_data: VoteEventCreate, request: Request, db: AsyncSes
             emote_set_name=vote_data.emoteSet['name'],
             duration_hours=total_hours,
             active_time_tab=vote_data.activeTimeTab,
-            permission_level=vote_data.permissions,
-            specific_users=getattr(vote_data, 'specific_users', [])
+            permission_level=vote_data.permissions
         )
     else:
         voting_event = VotingEvent(
@@ -817,8 +833,7 @@ async def create_vote(vote_data: VoteEventCreate, request: Request, db: AsyncSes
             emote_set_name=vote_data.emoteSet['name'],
             end_time=vote_data.endTime,
             active_time_tab=vote_data.activeTimeTab,
-            permission_level=vote_data.permissions,
-            specific_users=getattr(vote_data, 'specific_users', [])
+            permission_level=vote_data.permissions
         )
 
     # DEBUG: Log what we're storing
@@ -826,16 +841,33 @@ async def create_vote(vote_data: VoteEventCreate, request: Request, db: AsyncSes
 
     try:
         db.add(voting_event)
+        await db.flush()
+        await add_event_audience(db, voting_event.id, vote_data.specific_users or [])
+        await add_event_emotes(db, voting_event.id, emotes)
         await db.commit()
         await db.refresh(voting_event)
+        schedule_event_expiry(voting_event.id, voting_event.effective_end_time)
         print(f"[CREATE DEBUG] Event {voting_event.id} created with permission_level='{voting_event.permission_level}' (type: {type(voting_event.permission_level)}, repr: {repr(voting_event.permission_level)})")
         return {"success": True, "message": "Vote created successfully", "vote_id": voting_event.id}
     except Exception as e:
         await db.rollback()  # Undo any partial changes
         return {"success": False, "message": f"Failed to save vote: {str(e)}"}
 
+def counts_etag(event: VotingEvent, user: User) -> str:
+    # Counts include the caller's own choices, so the tag is per user as well
+    return f'W/"{event.id}-{event.tally_version}-{user.id}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+# A client more than this many versions behind gets a full snapshot instead of a diff
+COUNTS_DELTA_MAX_LAG = int(os.getenv('COUNTS_DELTA_MAX_LAG', '500'))
+
 @router.get('/votes/{event_id}/counts')
-async def get_vote_counts(event_id: int, request: Request, db: AsyncSession = Depends(get_database)):
+async def get_vote_counts(event_id: int, request: Request, response: Response, since: Optional[int] = None, db: AsyncSession = Depends(get_database)):
     try:
         # First, verify the event exists
         event_check = await db.execute(select(VotingEvent).where(VotingEvent.id == event_id))
@@ -851,40 +883,34 @@ async def get_vote_counts(event_id: int, request: Request, db: AsyncSession = De
         user = result.scalar_one_or_none()
         if not user:
             return {"success": False, "error": "User not found in database"}
+
+        # Nothing has been voted since the client's copy: skip the tally read entirely
+        etag = counts_etag(event, user)
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=cache_headers)
+        response.headers.update(cache_headers)
         
-        result = await db.execute(
-            select(
-                IndividualVote.emote_id,
-                IndividualVote.vote_choice,
-                func.count(IndividualVote.id).label('count')
-            )
-            .where(IndividualVote.voting_event_id == event_id)
-            .group_by(IndividualVote.emote_id, IndividualVote.vote_choice)
+        # ?since=<version> returns only emotes changed after that version,
+        # unless the client is too far behind (or ahead) to diff against
+        is_delta = (
+            since is not None
+            and 0 <= since <= event.tally_version
+            and event.tally_version - since <= COUNTS_DELTA_MAX_LAG
         )
+
+        # Tallies are maintained per (event, emote), so this is O(emotes) not O(votes)
+        emote_counts = await fetch_event_tallies(db, event_id, since if is_delta else None)
         
-        vote_counts = result.fetchall()
-        
-        result = await db.execute(
-            select(IndividualVote.emote_id, IndividualVote.vote_choice)
-            .where(IndividualVote.voting_event_id == event_id, IndividualVote.voter_id == int(user.id))
+        choices_query = select(IndividualVote.emote_id, IndividualVote.vote_choice).where(
+            IndividualVote.voting_event_id == event_id, IndividualVote.voter_id == int(user.id)
         )
+        if is_delta:
+            # The caller's own choices can only have changed where the tallies did
+            choices_query = choices_query.where(IndividualVote.emote_id.in_(list(emote_counts)))
+        result = await db.execute(choices_query)
         
         vote_choices = result.fetchall()
-        # Organize the data by emote_id
-        emote_counts = {}
-        for row in vote_counts:
-            emote_id = row.emote_id
-            vote_choice = row.vote_choice
-            count = row.count
-            
-            if emote_id not in emote_counts:
-                emote_counts[emote_id] = {
-                    'keep': 0,
-                    'remove': 0,
-                    'neutral': 0
-                }
-            
-            emote_counts[emote_id][vote_choice] = count
         
         user_choices = {}
         for choice in vote_choices:
@@ -896,6 +922,8 @@ async def get_vote_counts(event_id: int, request: Request, db: AsyncSession = De
         return {
             "success": True,
             "event_id": event_id,
+            "version": event.tally_version,
+            "full": not is_delta,
             "vote_counts": emote_counts,
             "vote_choices": user_choices
         }
@@ -903,6 +931,156 @@ async def get_vote_counts(event_id: int, request: Request, db: AsyncSession = De
     except Exception as e:
         return {"success": False, "error": f"Database error: {str(e)}"}
 
+@router.get('/votes/{event_id}/tallies')
+async def get_vote_tallies(event_id: int, request: Request, response: Response):
+    """Aggregate counts only, identical for every viewer who can see the event."""
+    user_session = request.session.get('user')
+    if not user_session:
+        return {"success": False, "error": "User not authenticated"}
+
+    # Short-lived session: a pooled connection held across the cache read below
+    # would deadlock the pool when many viewers miss the cache at once
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User).where(User.twitch_username == user_session['login']))
+        user = result.scalar_one_or_none()
+        if not user:
+            return {"success": False, "error": "User not in database"}
+
+        result = await db.execute(select(VotingEvent).where(VotingEvent.id == event_id))
+        event = result.scalar_one_or_none()
+        if not event:
+            return {"success": False, "error": "Event not found"}
+        if not await can_user_view_event(user, event, db):
+            return {"success": False, "error": "Access denied"}
+
+    try:
+        # Served from the per-worker micro-cache: one tally read per TTL, not per viewer
+        version, emote_counts = await tally_cache.get(event_id)
+    except Exception as e:
+        return {"success": False, "error": f"Database error: {str(e)}"}
+    if version is None:
+        return {"success": False, "error": "Event not found"}
+
+    etag = f'W/"{event_id}-{version}"'
+    cache_headers = {"ETag": etag, "Cache-Control": f"private, max-age={max(int(TALLY_CACHE_TTL_SECONDS), 1)}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+
+    return {
+        "success": True,
+        "event_id": event_id,
+        "version": version,
+        "vote_counts": emote_counts
+    }
+
+@router.get('/votes/{event_id}/emotes')
+async def get_voting_event_emotes(event_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_database)):
+    """The event's emote list from its snapshot; never changes once taken, so the browser can keep it."""
+    user_session = request.session.get('user')
+    if not user_session:
+        return {"success": False, "error": "User not authenticated"}
+
+    result = await db.execute(select(User).where(User.twitch_username == user_session['login']))
+    user = result.scalar_one_or_none()
+    if not user:
+        return {"success": False, "error": "User not in database"}
+
+    result = await db.execute(select(VotingEvent).where(VotingEvent.id == event_id))
+    event = result.scalar_one_or_none()
+    if not event:
+        return {"success": False, "error": "Event not found"}
+    if not await can_user_view_event(user, event, db):
+        return {"success": False, "error": "Access denied"}
+
+    emotes = await get_event_emotes(db, event_id)
+    if not emotes:
+        # Events created before snapshots existed get one on first request
+        set_emotes = await load_emote_set_emotes(event.emote_set_id)
+        if not set_emotes:
+            return {"success": False, "error": "Could not load the emote set from 7TV"}
+        await add_event_emotes(db, event_id, set_emotes)
+        await db.commit()
+        emotes = await get_event_emotes(db, event_id)
+
+    # Private: follower/subscriber-only lists mustn't land in shared caches
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    return {"success": True, "event_id": event_id, "emotes": emotes}
+
+@router.get('/votes/{event_id}/my-choices')
+async def get_my_vote_choices(event_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_database)):
+    """The caller's own vote per emote; pairs with /votes/{event_id}/tallies."""
+    user_session = request.session.get('user')
+    if not user_session:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        result = await db.execute(select(User.id).where(User.twitch_username == user_session['login']))
+        user_id = result.scalar_one_or_none()
+        if user_id is None:
+            return {"success": False, "error": "User not found in database"}
+
+        result = await db.execute(
+            select(IndividualVote.emote_id, IndividualVote.vote_choice).where(
+                IndividualVote.voting_event_id == event_id, IndividualVote.voter_id == user_id
+            )
+        )
+        response.headers["Cache-Control"] = "private, no-cache"
+        return {
+            "success": True,
+            "event_id": event_id,
+            "vote_choices": {row.emote_id: row.vote_choice for row in result.fetchall()}
+        }
+    except Exception as e:
+        return {"success": False, "error": f"Database error: {str(e)}"}
+
+@router.get('/votes/{event_id}/stream')
+async def stream_vote_counts(event_id: int, request: Request):
+    """Server-Sent Events feed of live tallies: one full snapshot, then changed emotes only."""
+    # Use a short-lived session here rather than Depends(get_database), which
+    # would keep a pooled connection checked out for the life of the stream
+    async with AsyncSessionLocal() as db:
+        user_session = request.session.get('user')
+        if not user_session:
+            return {"success": False, "error": "User not authenticated"}
+
+        result = await db.execute(select(User).where(User.twitch_username == user_session['login']))
+        user = result.scalar_one_or_none()
+        if not user:
+            return {"success": False, "error": "User not in database"}
+
+        result = await db.execute(select(VotingEvent).where(VotingEvent.id == event_id))
+        event = result.scalar_one_or_none()
+        if not event:
+            return {"success": False, "error": "Event not found"}
+        if not await can_user_view_event(user, event, db):
+            return {"success": False, "error": "Access denied"}
+
+    subscription = await tally_hub.subscribe(event_id)
+
+    async def event_stream():
+        try:
+            message_type = 'snapshot'
+            while True:
+                if await request.is_disconnected():
+                    break
+                counts = await subscription.next(timeout=TALLY_STREAM_KEEPALIVE_SECONDS)
+                if counts is None:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                payload = json.dumps({"event_id": event_id, "vote_counts": counts})
+                yield f"event: {message_type}\ndata: {payload}\n\n"
+                message_type = 'delta'
+        finally:
+            tally_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get('/votes/{event_id}')
 async def get_voting_event_by_id(event_id: int, request: Request, db: AsyncSession = Depends(get_database)):
     # User session check (you have this)
@@ -941,7 +1119,8 @@ async def get_voting_event_by_id(event_id: int, request: Request, db: AsyncSessi
         if event.permission_level == "all":
             user_can_access = True 
         elif event.permission_level == "specific":
-            if event.specific_users and user_session["login"] in event.specific_users:
+            result = await db.execute(select(is_in_event_audience(event.id, user_session["login"])))
+            if result.scalar():
                 user_can_access = True 
         elif event.permission_level == "followers":
             # Check if user follows the event creator
@@ -969,22 +1148,14 @@ async def get_voting_event_by_id(event_id: int, request: Request, db: AsyncSessi
     can_edit = False
     if user.id == event.creator_id:
         can_edit = True
-    elif creator and creator.moderators and user.twitch_username in creator.moderators:
+    elif await user_moderates_channel(db, event.creator_id, user.id):
         can_edit = True
     # Calculate end time
-    if event.active_time_tab == "duration":
-        end_time = event.created_at + timedelta(hours=event.duration_hours)
-    elif event.active_time_tab == "endTime":
-        end_time = event.end_time
+    end_time = event.effective_end_time
 
     now = datetime.now(dt_timezone.utc)
 
     is_currently_active = end_time > now
-    
-    # NEW: Update database if event has expired
-    if not is_currently_active and event.is_active:
-        event.is_active = False
-        await db.commit()
 
     # Calculate time info
     if is_currently_active:
@@ -1010,30 +1181,19 @@ async def get_voting_event_by_id(event_id: int, request: Request, db: AsyncSessi
         else:
             time_ended = "Recently ended"
 
-    voter_counts = await db.execute(
-        select(
-            IndividualVote.voting_event_id,
-            func.count(func.distinct(IndividualVote.voter_id)).label('unique_voters')
-        )
-        .where(IndividualVote.voting_event_id == event_id)
-        .group_by(IndividualVote.voting_event_id)
-    )
-
-    voter_counts_dict = {row.voting_event_id: row.unique_voters for row in voter_counts.fetchall()}
-
     event_data = {
     "id": event.id,
     "title": event.title,
     "creator_username": creator_name,
     "emote_set_name": event.emote_set_name,
     "emote_set_id": event.emote_set_id,
-    "total_votes": voter_counts_dict.get(event.id, 0),
+    "total_votes": event.voter_count,
     "is_active": is_currently_active,
     "time_remaining": time_left if is_currently_active else None,
     "time_ended": time_ended if not is_currently_active else None,
     "end_time": end_time.isoformat() if is_currently_active else None,  # Add end_time for live countdown
     "can_edit": can_edit,
     "permission_level": event.permission_level,  
-    "specific_users": event.specific_users or []  
+    "specific_users": (await get_event_audiences(db, [event.id])).get(event.id, [])
 }
     return {"success": True, "event": event_data}
\ No newline at end of file
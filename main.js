@@ -79,7 +79,12 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
             
             if (data.success) {
-                displayVotingEvents(data.active_events, data.expired_events);
+                // The list filters client-side, so pull in any remaining pages
+                const [activeEvents, expiredEvents] = await Promise.all([
+                    fetchRemainingEventPages('active', data.active_events, data.next_cursors?.active),
+                    fetchRemainingEventPages('expired', data.expired_events, data.next_cursors?.expired)
+                ]);
+                displayVotingEvents(activeEvents, expiredEvents);
             } else {
                 contentArea.innerHTML = '<p>Error loading voting events</p>';
             }
@@ -89,6 +94,17 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    async function fetchRemainingEventPages(status, events, cursor) {
+        while (cursor) {
+            const response = await fetch(`${API_BASE}/votes/voting-events?status=${status}&cursor=${cursor}`, { credentials: 'include' });
+            const page = await response.json();
+            if (!page.success) break;
+            events = events.concat(page[`${status}_events`]);
+            cursor = page.next_cursors?.[status];
+        }
+        return events;
+    }
+
     voteCreationButton.addEventListener('click', async function() {
         // Update active nav button
         homeButton.classList.remove('active');
@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,6 +7,13 @@ from api.emotes import router as emotes_router
 from api.auth import router as auth_router
 from api.votes import router as votes_router
 from api.mods import router as mods_router 
+from api.votes import flush_buffered_votes
+from api.vote_buffer import start_vote_buffer, stop_vote_buffer
+from api.tally_listener import start_tally_listener, stop_tally_listener
+from api.event_expiry import start_expiry_scheduler, stop_expiry_scheduler
+from api.http_client import start_http_client, stop_http_client, get_http_pool_stats
+from api.token_renewer import start_token_renewer, stop_token_renewer
+from contextlib import asynccontextmanager
 import mimetypes
 import os
 from dotenv import load_dotenv
@@ -17,11 +24,28 @@ load_dotenv()
 HTTPS_ONLY = os.getenv('HTTPS_ONLY', 'false').lower() == 'true'
 SESSION_DOMAIN = os.getenv('SESSION_DOMAIN', None)
 FRONTEND_ORIGIN = os.getenv('FRONTEND_URL', 'http://localhost:8000')
+# Twitch logins allowed to read /health/* (comma separated); empty means nobody
+HEALTH_OPERATORS = {login.strip().lower() for login in os.getenv('HEALTH_OPERATORS', '').split(',') if login.strip()}
 
 # This is crucial - add JavaScript MIME type before creating the app
 mimetypes.add_type('application/javascript', '.js')
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_http_client()
+    start_vote_buffer(flush_buffered_votes)
+    start_tally_listener()
+    start_expiry_scheduler()
+    start_token_renewer()
+    yield
+    # Drain buffered votes before the worker exits
+    await stop_vote_buffer()
+    await stop_tally_listener()
+    await stop_expiry_scheduler()
+    await stop_token_renewer()
+    await stop_http_client()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +75,15 @@ app.mount("/static", StaticFiles(directory=".", html=True), name="static")
 @app.get("/")
 async def root():
     return FileResponse("index.html")
+@app.get("/health/http-pool")
+async def http_pool_stats(request: Request):
+    # Pool internals are for operators, not the public
+    user_session = request.session.get('user')
+    if not user_session:
+        return {"success": False, "message": "User not authenticated"}
+    if user_session.get('login', '').lower() not in HEALTH_OPERATORS:
+        return {"success": False, "message": "Access denied"}
+    return get_http_pool_stats()
 @app.get("/favicon.ico")
 async def favicon():
     return {"message": "No favicon"}
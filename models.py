@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, ARRAY, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Date, ForeignKey, Boolean, Float, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from database import Base
 
@@ -9,8 +10,6 @@ class User(Base):
     twitch_user_id = Column(String, unique=True, nullable=False)
     twitch_username = Column(String, unique=True, nullable=False)
     sevenTV_id = Column(String, unique=True, nullable=False)
-    can_create_votes_for = Column(ARRAY(String), default=[])
-    moderators = Column(ARRAY(String), default=[])
     login_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_login = Column(DateTime(timezone=True))
@@ -35,12 +34,22 @@ class VotingEvent(Base):
     end_time = Column(DateTime(timezone=True))
     active_time_tab = Column(String)
     permission_level = Column(String)
-    specific_users = Column(ARRAY(String))
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # created_at + duration_hours or end_time, depending on active_time_tab.
+    # Set by a trigger; read-only here.
+    effective_end_time = Column(DateTime(timezone=True), index=True)
+    # Bumped by a trigger on every vote write; used as the ETag for vote counts
+    tally_version = Column(BigInteger, nullable=False, server_default='0')
+    # Distinct voters, kept up to date by triggers on individual_votes
+    voter_count = Column(Integer, nullable=False, server_default='0')
 
 class IndividualVote(Base):
     __tablename__ = "individual_votes"
+    __table_args__ = (
+        # One vote per voter per emote per event; /votes/submit upserts against this
+        UniqueConstraint('voting_event_id', 'voter_id', 'emote_id', name='uq_individual_votes_event_voter_emote'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     voting_event_id = Column(Integer, ForeignKey("voting_events.id"))
@@ -49,6 +58,73 @@ class IndividualVote(Base):
     vote_choice = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class EventAudience(Base):
+    # Invitees of a "specific" event, by username since they may not have signed up yet
+    __tablename__ = "event_audience"
+    __table_args__ = (
+        # "Which events was this user invited to" for the event listing
+        Index('ix_event_audience_username_event', 'twitch_username', 'event_id'),
+    )
+
+    event_id = Column(Integer, ForeignKey("voting_events.id", ondelete="CASCADE"), primary_key=True)
+    twitch_username = Column(String, primary_key=True)
+
+class EventEmote(Base):
+    # The event's emote set as it was when the event was created, so the list
+    # can't drift mid-vote and viewers never need 7TV to load it
+    __tablename__ = "event_emotes"
+    __table_args__ = (
+        UniqueConstraint('event_id', 'emote_id', name='uq_event_emotes_event_emote'),
+    )
+
+    event_id = Column(Integer, ForeignKey("voting_events.id", ondelete="CASCADE"), primary_key=True)
+    ordinal = Column(Integer, primary_key=True)  # position in the set, from 0
+    emote_id = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+
+class EventEmoteTally(Base):
+    __tablename__ = "event_emote_tallies"
+
+    # Kept in sync with individual_votes by statement-level triggers
+    # (see migration d41f7b2e9c05); never written from application code.
+    voting_event_id = Column(Integer, ForeignKey("voting_events.id"), primary_key=True)
+    emote_id = Column(String, primary_key=True)
+    keep_count = Column(Integer, nullable=False, default=0)
+    neutral_count = Column(Integer, nullable=False, default=0)
+    remove_count = Column(Integer, nullable=False, default=0)
+    # voting_events.tally_version of the write that last changed this row
+    version = Column(BigInteger, nullable=False, server_default='0')
+
+class ChannelModerator(Base):
+    # channel_user_id's mod team includes moderator_user_id. Mods who haven't
+    # signed up yet wait in pending_permissions until their first login.
+    __tablename__ = "channel_moderators"
+    __table_args__ = (
+        # The primary key covers channel -> mods; this covers mod -> channels
+        Index('ix_channel_moderators_moderator_channel', 'moderator_user_id', 'channel_user_id'),
+    )
+
+    channel_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    moderator_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EmoteSetSnapshot(Base):
+    # Last copy of a 7TV emote set fetched from upstream (see api/emote_set_cache.py)
+    __tablename__ = "emote_set_snapshots"
+
+    emote_set_id = Column(String, primary_key=True)
+    name = Column(String)
+    emotes = Column(JSONB, nullable=False)  # [{"id": ..., "name": ...}, ...]
+    fetched_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class SevenTVUserEmoteSets(Base):
+    # Last copy of a 7TV user's emote set list, with three preview emotes per set
+    __tablename__ = "seventv_user_emote_sets"
+
+    seventv_user_id = Column(String, primary_key=True)
+    emote_sets = Column(JSONB, nullable=False)  # [{"id", "name", "preview_emotes"}, ...]
+    fetched_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
 class PendingPermissions(Base):
     __tablename__ = "pending_permissions"
 
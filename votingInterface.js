@@ -1,4 +1,4 @@
-import { getEmotesFromSet, getEmoteImgUrl, createNeutralVote, createNeutralVotesInBackground, getVoteCounts } from "./api.js";
+import { getEventEmotes, getEmoteImgUrl, createNeutralVote, createNeutralVotesInBackground, getVoteTallies, getMyVoteChoices } from "./api.js";
 import { API_BASE } from './config.js';
 import { getCachedUser } from './userCache.js';
 const contentArea = document.querySelector('#content-area');
@@ -6,6 +6,9 @@ const contentArea = document.querySelector('#content-area');
 // Store active timers for cleanup
 const activeTimers = new Map();
 
+// Live tally stream for the event currently on screen
+let activeTallyStream = null;
+
 // Format time remaining with adaptive colon format
 function formatTimeRemaining(remainingMs) {
     const totalSeconds = Math.floor(remainingMs / 1000);
@@ -104,6 +107,10 @@ export function cleanupTimers() {
         clearInterval(timerId);
     });
     activeTimers.clear();
+    if (activeTallyStream) {
+        activeTallyStream.close();
+        activeTallyStream = null;
+    }
 }
 function calculateTotalVotes(voteCounts) {
     let totalKeep = 0, totalNeutral = 0, totalRemove = 0;
@@ -115,6 +122,66 @@ function calculateTotalVotes(voteCounts) {
     return { totalKeep, totalNeutral, totalRemove };
 }
 
+function renderEmoteCounts(emoteId, counts) {
+    // Only emotes on the current page have buttons to update
+    const emoteDiv = document.getElementById(emoteId);
+    if (!emoteDiv) return;
+    emoteDiv.querySelector('.vote-keep').textContent = `yes (${counts?.keep || 0})`;
+    emoteDiv.querySelector('.vote-neutral').textContent = `idc (${counts?.neutral || 0})`;
+    emoteDiv.querySelector('.vote-remove').textContent = `no (${counts?.remove || 0})`;
+}
+
+function renderVoteStatistics(event, voteCounts) {
+    const { totalKeep, totalNeutral, totalRemove } = calculateTotalVotes(voteCounts);
+    const voteStatsDiv = document.getElementById('vote-statistics');
+    if (voteStatsDiv) {
+        voteStatsDiv.innerHTML = `
+            <strong>Vote Statistics:</strong><br>
+            Total Voters: ${event.total_votes || 0}<br>
+            Keep: ${totalKeep} | Neutral: ${totalNeutral} | Remove: ${totalRemove}
+        `;
+    }
+}
+
+function applyVoteCounts(event, voteCounts, updatedCounts) {
+    for (const emoteId in updatedCounts) {
+        voteCounts[emoteId] = updatedCounts[emoteId];
+        renderEmoteCounts(emoteId, updatedCounts[emoteId]);
+    }
+    renderVoteStatistics(event, voteCounts);
+}
+
+// After the user's own vote, counts normally arrive through the tally stream;
+// only when it isn't connected are they re-read from the shared /tallies cache
+async function refreshCountsIfNotStreaming(event, voteCounts) {
+    if (activeTallyStream && activeTallyStream.readyState === EventSource.OPEN) return;
+    try {
+        const tallyData = await getVoteTallies(event.id);
+        if (tallyData.success) {
+            applyVoteCounts(event, voteCounts, tallyData.vote_counts || {});
+        }
+    } catch (error) {
+        console.error('Error refreshing vote counts:', error);
+    }
+}
+
+function subscribeToTallies(event, voteCounts) {
+    const stream = new EventSource(`${API_BASE}/votes/${event.id}/stream`, { withCredentials: true });
+    activeTallyStream = stream;
+
+    function applyCounts(message) {
+        const data = JSON.parse(message.data);
+        applyVoteCounts(event, voteCounts, data.vote_counts);
+    }
+
+    stream.addEventListener('snapshot', applyCounts);
+    stream.addEventListener('delta', applyCounts);
+    stream.onerror = () => {
+        // EventSource reconnects on its own; just note it for debugging
+        console.log('[TALLY STREAM] Connection interrupted, browser will retry');
+    };
+}
+
 async function createVotingInterface(event, isExpired = false) {
     console.log("Selected voting event:", event);
 
@@ -125,11 +192,12 @@ async function createVotingInterface(event, isExpired = false) {
     const parallelStartTime = performance.now();
     console.log('[PARALLEL API] Starting parallel API calls...');
     
-    // Start all three API calls in parallel
-    const [authResponse, emotesData, voteData] = await Promise.all([
+    // Start all API calls in parallel
+    const [authResponse, emotesData, tallyData, choicesData] = await Promise.all([
         getCachedUser(),
-        getEmotesFromSet(event.emote_set_id),
-        getVoteCounts(event.id)
+        getEventEmotes(event.id),
+        getVoteTallies(event.id),
+        getMyVoteChoices(event.id)
     ]);
     
     const parallelEndTime = performance.now();
@@ -147,12 +215,12 @@ async function createVotingInterface(event, isExpired = false) {
 
     const emotes = emotesData.emotes;
     
-    if (!voteData.success) {
-        console.error('Failed to get vote data:', voteData.error);
+    if (!tallyData.success || !choicesData.success) {
+        console.error('Failed to get vote data:', tallyData.error || choicesData.error);
         return;
     }
-    const voteCounts = voteData.vote_counts || {};
-    const userVotes = voteData.vote_choices || {};
+    const voteCounts = tallyData.vote_counts || {};
+    const userVotes = choicesData.vote_choices || {};
 
     contentArea.innerHTML = '';
 
@@ -498,55 +566,9 @@ async function createVotingInterface(event, isExpired = false) {
         }
 
         // Vote button event listeners
-        keepButton.addEventListener('click', async function () {
-            const response = await fetch(`${API_BASE}/votes/submit`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                credentials: 'include',
-                body: JSON.stringify({
-                    voting_event_id: event.id,  
-                    emote_id: emote.id,
-                    vote_choice: 'keep'  
-                })
-            });
-            const result = await response.json();
-            if (result.success) {
-                keepButton.classList.remove('inactive');
-                keepButton.classList.add('active');
-                neutralButton.classList.remove('active');
-                neutralButton.classList.add('inactive');
-                removeButton.classList.remove('active');
-                removeButton.classList.add('inactive');
-
-                // Trigger flip animation
-                emoteImg.classList.add('flip-animation');
-                setTimeout(() => emoteImg.classList.remove('flip-animation'), 600);
-
-                const updatedVoteData = await getVoteCounts(event.id);
-                keepButton.textContent = `yes (${updatedVoteData.vote_counts[emote.id]?.keep || 0})`;
-                neutralButton.textContent = `idc (${updatedVoteData.vote_counts[emote.id]?.neutral || 0})`;
-                removeButton.textContent = `no (${updatedVoteData.vote_counts[emote.id]?.remove || 0})`;
-                const { totalKeep, totalNeutral, totalRemove } = calculateTotalVotes(updatedVoteData.vote_counts);
-                const voteStatsDiv = document.getElementById('vote-statistics');
-                if (voteStatsDiv) {
-                    voteStatsDiv.innerHTML = `
-                        <strong>Vote Statistics:</strong><br>
-                        Total Voters: ${event.total_votes || 0}<br>
-                        Keep: ${totalKeep} | Neutral: ${totalNeutral} | Remove: ${totalRemove}
-                    `;
-                }
-            } else {
-                if (result.message === "This voting event has expired") {
-                    alert('This voting event has expired. Refreshing...');
-                    await createVotingInterface(event, true);
-                } else {
-                    console.error('Vote failed:', result.message);
-                    alert('Failed to submit vote: ' + result.message);
-                }
-            }
-        });
+        const buttonsByChoice = { keep: keepButton, neutral: neutralButton, remove: removeButton };
 
-        removeButton.addEventListener('click', async function () {
+        async function submitChoice(choice) {
             const response = await fetch(`${API_BASE}/votes/submit`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -554,87 +576,24 @@ async function createVotingInterface(event, isExpired = false) {
                 body: JSON.stringify({
                     voting_event_id: event.id,  
                     emote_id: emote.id,
-                    vote_choice: 'remove'  
+                    vote_choice: choice
                 })
             });
             const result = await response.json();
             if (result.success) {
-                keepButton.classList.remove('active');
-                keepButton.classList.add('inactive');
-                neutralButton.classList.remove('active');
-                neutralButton.classList.add('inactive');
-                removeButton.classList.remove('inactive');
-                removeButton.classList.add('active');
-
-                // Trigger flip animation
-                emoteImg.classList.add('flip-animation');
-                setTimeout(() => emoteImg.classList.remove('flip-animation'), 600);
-
-                const updatedVoteData = await getVoteCounts(event.id);
-                // Update voteCounts object for sorting
-                voteCounts[emote.id] = updatedVoteData.vote_counts[emote.id];
-                keepButton.textContent = `yes (${updatedVoteData.vote_counts[emote.id]?.keep || 0})`;
-                neutralButton.textContent = `idc (${updatedVoteData.vote_counts[emote.id]?.neutral || 0})`;
-                removeButton.textContent = `no (${updatedVoteData.vote_counts[emote.id]?.remove || 0})`;
-                const { totalKeep, totalNeutral, totalRemove } = calculateTotalVotes(updatedVoteData.vote_counts);
-                const voteStatsDiv = document.getElementById('vote-statistics');
-                if (voteStatsDiv) {
-                    voteStatsDiv.innerHTML = `
-                        <strong>Vote Statistics:</strong><br>
-                        Total Voters: ${event.total_votes || 0}<br>
-                        Keep: ${totalKeep} | Neutral: ${totalNeutral} | Remove: ${totalRemove}
-                    `;
+                for (const [buttonChoice, button] of Object.entries(buttonsByChoice)) {
+                    button.classList.toggle('active', buttonChoice === choice);
+                    button.classList.toggle('inactive', buttonChoice !== choice);
                 }
-            } else {
-                if (result.message === "This voting event has expired") {
-                    alert('This voting event has expired. Refreshing...');
-                    await createVotingInterface(event, true);
-                } else {
-                    console.error('Vote failed:', result.message);
-                    alert('Failed to submit vote: ' + result.message);
+                if (userVotes) {
+                    userVotes[emote.id] = choice;
                 }
-            }
-        });
-
-        neutralButton.addEventListener('click', async function () {
-            const response = await fetch(`${API_BASE}/votes/submit`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                credentials: 'include',
-                body: JSON.stringify({
-                    voting_event_id: event.id,  
-                    emote_id: emote.id,
-                    vote_choice: 'neutral'  
-                })
-            });
-            const result = await response.json();
-            if (result.success) {
-                keepButton.classList.remove('active');
-                keepButton.classList.add('inactive');
-                neutralButton.classList.remove('inactive');
-                neutralButton.classList.add('active');
-                removeButton.classList.remove('active');
-                removeButton.classList.add('inactive');
 
                 // Trigger flip animation
                 emoteImg.classList.add('flip-animation');
                 setTimeout(() => emoteImg.classList.remove('flip-animation'), 600);
 
-                const updatedVoteData = await getVoteCounts(event.id);
-                // Update voteCounts object for sorting
-                voteCounts[emote.id] = updatedVoteData.vote_counts[emote.id];
-                keepButton.textContent = `yes (${updatedVoteData.vote_counts[emote.id]?.keep || 0})`;
-                neutralButton.textContent = `idc (${updatedVoteData.vote_counts[emote.id]?.neutral || 0})`;
-                removeButton.textContent = `no (${updatedVoteData.vote_counts[emote.id]?.remove || 0})`;
-                const { totalKeep, totalNeutral, totalRemove } = calculateTotalVotes(updatedVoteData.vote_counts);
-                const voteStatsDiv = document.getElementById('vote-statistics');
-                if (voteStatsDiv) {
-                    voteStatsDiv.innerHTML = `
-                        <strong>Vote Statistics:</strong><br>
-                        Total Voters: ${event.total_votes || 0}<br>
-                        Keep: ${totalKeep} | Neutral: ${totalNeutral} | Remove: ${totalRemove}
-                    `;
-                }
+                await refreshCountsIfNotStreaming(event, voteCounts);
             } else {
                 if (result.message === "This voting event has expired") {
                     alert('This voting event has expired. Refreshing...');
@@ -644,7 +603,11 @@ async function createVotingInterface(event, isExpired = false) {
                     alert('Failed to submit vote: ' + result.message);
                 }
             }
-        });
+        }
+
+        keepButton.addEventListener('click', () => submitChoice('keep'));
+        removeButton.addEventListener('click', () => submitChoice('remove'));
+        neutralButton.addEventListener('click', () => submitChoice('neutral'));
 
         const voteButtonsDiv = document.createElement('div');
         voteButtonsDiv.className = 'vote-buttons-div'
@@ -764,6 +727,11 @@ async function createVotingInterface(event, isExpired = false) {
     
     // Initial render
     renderEmotePage();
+
+    // Live tallies: apply other viewers' votes as they come in
+    if (!isExpired) {
+        subscribeToTallies(event, voteCounts);
+    }
     
     // Create emote layout wrapper
     const emoteLayout = document.createElement('div');